@@ -0,0 +1,345 @@
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import list_races
+from compact_archive import find_live_span
+from compute_leaderboards import boat_to_team_map, find_expected_race
+from download_events import iso_to_unix_ms
+from transitions import RACE_ENTITY, boat_entity, build_transitions
+
+ANALYTICS_PATH = os.path.join("indexes", "analytics.sqlite")
+SCHEDULE_FILE = "races-data.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS events (
+    season TEXT NOT NULL,
+    event TEXT NOT NULL,
+    event_name TEXT,
+    city TEXT,
+    country TEXT,
+    start_ts INTEGER,
+    end_ts INTEGER,
+    scheduled_races INTEGER,
+    winner_team TEXT,
+    PRIMARY KEY (season, event)
+);
+CREATE TABLE IF NOT EXISTS teams (
+    season TEXT NOT NULL,
+    event TEXT NOT NULL,
+    code TEXT NOT NULL,
+    name TEXT,
+    boat_id TEXT,
+    PRIMARY KEY (season, event, code)
+);
+CREATE TABLE IF NOT EXISTS race_stats (
+    path TEXT PRIMARY KEY,
+    season TEXT NOT NULL,
+    event TEXT NOT NULL,
+    day TEXT NOT NULL,
+    race_folder TEXT NOT NULL,
+    race_name TEXT,
+    scheduled_start_ts INTEGER,
+    scheduled_end_ts INTEGER,
+    packet_count INTEGER,
+    byte_size INTEGER,
+    first_ts INTEGER,
+    last_ts INTEGER,
+    recorded_seconds REAL,
+    live_start_ts INTEGER,
+    live_end_ts INTEGER,
+    live_seconds REAL,
+    first_status TEXT,
+    last_status TEXT,
+    boats INTEGER,
+    winner_team TEXT,
+    catalog_updated REAL
+);
+CREATE INDEX IF NOT EXISTS race_stats_event ON race_stats (season, event);
+CREATE TABLE IF NOT EXISTS boat_status (
+    path TEXT NOT NULL,
+    boat TEXT NOT NULL,
+    team_code TEXT,
+    status TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (path, boat, status)
+);
+CREATE TABLE IF NOT EXISTS event_stats (
+    season TEXT NOT NULL,
+    event TEXT NOT NULL,
+    event_name TEXT,
+    city TEXT,
+    scheduled_races INTEGER,
+    downloaded_races INTEGER,
+    packets INTEGER,
+    bytes INTEGER,
+    avg_recorded_seconds REAL,
+    avg_live_seconds REAL,
+    PRIMARY KEY (season, event)
+);
+"""
+
+RACE_COLUMNS = (
+    "path",
+    "season",
+    "event",
+    "day",
+    "race_folder",
+    "race_name",
+    "scheduled_start_ts",
+    "scheduled_end_ts",
+    "packet_count",
+    "byte_size",
+    "first_ts",
+    "last_ts",
+    "recorded_seconds",
+    "live_start_ts",
+    "live_end_ts",
+    "live_seconds",
+    "first_status",
+    "last_status",
+    "boats",
+    "winner_team",
+    "catalog_updated",
+)
+
+
+def connect_analytics(path=ANALYTICS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def status_durations(log):
+    """Seconds each boat spent in each status, up to the last packet."""
+    durations = {}
+    since = {}
+    for ts, entity, old, new in log["transitions"]:
+        if not entity.startswith(boat_entity("")):
+            continue
+        if entity in since:
+            start_ts, status = since[entity]
+            key = (entity, status)
+            durations[key] = durations.get(key, 0) + ts - start_ts
+        since[entity] = (ts, new)
+    for entity, (start_ts, status) in since.items():
+        key = (entity, status)
+        durations[key] = durations.get(key, 0) + log["last_ts"] - start_ts
+    return {key: ms / 1000 for key, ms in durations.items()}
+
+
+def race_facts(race_path):
+    log, _ = build_transitions(race_path)
+    span = find_live_span(log) if log["first_ts"] is not None else None
+    return {
+        "first_status": log["first_status"],
+        "last_status": log["last_status"],
+        "live_start_ts": span[0] if span else None,
+        "live_end_ts": span[1] if span else None,
+        "boats": sum(1 for entity in log["final_states"] if entity != RACE_ENTITY),
+        "durations": status_durations(log) if log["first_ts"] is not None else {},
+    }
+
+
+def official_winner(leaderboard):
+    for item in leaderboard or []:
+        if item.get("pos") == 1:
+            return item.get("team_code")
+    return None
+
+
+def refresh_metadata(conn, races_data):
+    events = []
+    teams = []
+    for season, season_data in races_data.items():
+        for event, event_data in season_data.get("events", {}).items():
+            dates = event_data.get("dates") or {}
+            days = event_data.get("days", [])
+            events.append(
+                (
+                    season,
+                    event,
+                    event_data.get("event_name"),
+                    event_data.get("city"),
+                    event_data.get("country"),
+                    iso_to_unix_ms(dates.get("start")) or None,
+                    iso_to_unix_ms(dates.get("end")) or None,
+                    sum(len(day.get("races", [])) for day in days),
+                    (event_data.get("winner") or {}).get("team_code"),
+                )
+            )
+            for code, team in event_data.get("teams", {}).items():
+                boat_id = team.get("boat_id")
+                teams.append(
+                    (
+                        season,
+                        event,
+                        code,
+                        team.get("name"),
+                        None if boat_id is None else str(boat_id),
+                    )
+                )
+    conn.execute("DELETE FROM events")
+    conn.execute("DELETE FROM teams")
+    conn.executemany(f"INSERT INTO events VALUES ({', '.join('?' * 9)})", events)
+    conn.executemany("INSERT INTO teams VALUES (?, ?, ?, ?, ?)", teams)
+
+
+def race_rows(row, facts, races_data):
+    event_data, expected = find_expected_race(
+        races_data, row["season"], row["event"], row["race_folder"]
+    )
+    expected = expected or {}
+    teams = boat_to_team_map(event_data)
+
+    def seconds(start_ts, end_ts):
+        if start_ts is None or end_ts is None:
+            return None
+        return (end_ts - start_ts) / 1000
+
+    values = {
+        "path": row["path"],
+        "season": row["season"],
+        "event": row["event"],
+        "day": row["day"],
+        "race_folder": row["race_folder"],
+        "race_name": expected.get("name"),
+        "scheduled_start_ts": iso_to_unix_ms(expected.get("start_date_time")) or None,
+        "scheduled_end_ts": iso_to_unix_ms(expected.get("end_date_time")) or None,
+        "packet_count": row["packet_count"],
+        "byte_size": row["byte_size"],
+        "first_ts": row["first_ts"],
+        "last_ts": row["last_ts"],
+        "recorded_seconds": seconds(row["first_ts"], row["last_ts"]),
+        "live_start_ts": facts["live_start_ts"],
+        "live_end_ts": facts["live_end_ts"],
+        "live_seconds": seconds(facts["live_start_ts"], facts["live_end_ts"]),
+        "first_status": facts["first_status"],
+        "last_status": facts["last_status"],
+        "boats": facts["boats"],
+        "winner_team": official_winner(expected.get("leaderboard")),
+        "catalog_updated": row["updated"],
+    }
+    statuses = []
+    for (entity, status), duration in sorted(facts["durations"].items()):
+        boat = entity[len(boat_entity("")) :]
+        statuses.append((row["path"], boat, teams.get(boat), status, duration))
+    return tuple(values[column] for column in RACE_COLUMNS), statuses
+
+
+def refresh_event_stats(conn):
+    conn.execute("DELETE FROM event_stats")
+    conn.execute(
+        """
+        INSERT INTO event_stats
+        SELECT keys.season, keys.event, e.event_name, e.city, e.scheduled_races,
+               COUNT(r.path), COALESCE(SUM(r.packet_count), 0),
+               COALESCE(SUM(r.byte_size), 0), AVG(r.recorded_seconds),
+               AVG(r.live_seconds)
+        FROM (
+            SELECT season, event FROM events
+            UNION SELECT season, event FROM race_stats
+        ) AS keys
+        LEFT JOIN events e ON e.season = keys.season AND e.event = keys.event
+        LEFT JOIN race_stats r ON r.season = keys.season AND r.event = keys.event
+        GROUP BY keys.season, keys.event
+        """
+    )
+
+
+def build_analytics(
+    data_dir, races_data, schedule_mtime, conn, force=False, workers=None
+):
+    stored = dict(conn.execute("SELECT key, value FROM meta"))
+    schedule_changed = stored.get("schedule_mtime") != str(schedule_mtime)
+    if schedule_changed or force:
+        refresh_metadata(conn, races_data)
+
+    catalog_rows = {row["path"]: row for row in list_races(data_dir)}
+    known = dict(conn.execute("SELECT path, catalog_updated FROM race_stats"))
+    # Catalog rows are re-stamped whenever a race changes; schedule edits can
+    # change names, scheduled times and winners for every race.
+    stale = [
+        row
+        for path, row in catalog_rows.items()
+        if force or schedule_changed or known.get(path) != row["updated"]
+    ]
+    removed = [path for path in known if path not in catalog_rows]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        facts = list(executor.map(race_facts, [row["path"] for row in stale]))
+
+    with conn:
+        for path in removed + [row["path"] for row in stale]:
+            conn.execute("DELETE FROM race_stats WHERE path = ?", (path,))
+            conn.execute("DELETE FROM boat_status WHERE path = ?", (path,))
+        for row, race in zip(stale, facts):
+            values, statuses = race_rows(row, race, races_data)
+            conn.execute(
+                f"INSERT INTO race_stats VALUES ({', '.join('?' * len(values))})",
+                values,
+            )
+            conn.executemany(
+                "INSERT INTO boat_status VALUES (?, ?, ?, ?, ?)", statuses
+            )
+        refresh_event_stats(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('schedule_mtime', ?)",
+            (str(schedule_mtime),),
+        )
+    return len(stale), len(removed)
+
+
+def run_query(conn, sql):
+    started = time.perf_counter()
+    cursor = conn.execute(sql)
+    rows = cursor.fetchall()
+    elapsed = time.perf_counter() - started
+    if cursor.description:
+        print("\t".join(column[0] for column in cursor.description))
+        for row in rows:
+            print("\t".join("" if value is None else str(value) for value in row))
+    print(f"\n{len(rows)} rows in {elapsed * 1000:.1f} ms")
+
+
+def main():
+    from main import load_races_data
+
+    parser = argparse.ArgumentParser(
+        description="Materialize per-race and per-event analytics tables"
+    )
+    parser.add_argument("--db", default=ANALYTICS_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--data-dir", default="data")
+    build_parser.add_argument("--force", action="store_true")
+    build_parser.add_argument("--workers", type=int, default=os.cpu_count())
+
+    query_parser = subparsers.add_parser("query")
+    query_parser.add_argument("sql")
+    args = parser.parse_args()
+
+    conn = connect_analytics(args.db)
+    if args.command == "build":
+        races_data = load_races_data() if os.path.exists(SCHEDULE_FILE) else {}
+        schedule_mtime = os.stat(SCHEDULE_FILE).st_mtime_ns if races_data else None
+        refreshed, removed = build_analytics(
+            args.data_dir, races_data, schedule_mtime, conn, args.force, args.workers
+        )
+        total = conn.execute("SELECT COUNT(*) FROM race_stats").fetchone()[0]
+        print(
+            f"📊 {total} races in {args.db}: {refreshed} refreshed, {removed} removed"
+        )
+    else:
+        run_query(conn, args.sql)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
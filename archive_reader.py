@@ -0,0 +1,215 @@
+import argparse
+import bisect
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+import codec
+from packets import artefact_path, list_packet_entries
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_INDEXES = 512
+# Decoded packets take several times their size on disk (about 3.5x measured
+# with orjson on typical packets), so the cache budget is charged that much.
+DECODED_SIZE_FACTOR = 4
+
+
+class ArchiveReader:
+    """Read-only access to race packets with a shared, size-bounded cache.
+
+    Decoded packets are cached per file (deduplicated timestamps share one
+    entry) and evicted least-recently-used once their estimated decoded size
+    exceeds ``max_bytes``; ``max_bytes=0`` disables packet caching. Per-race
+    timestamp indexes are cached as well and revalidated against the folder
+    and dedup manifest mtimes. Cached packets are shared between callers and
+    must not be mutated.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_indexes=DEFAULT_MAX_INDEXES):
+        self.max_bytes = max_bytes
+        self.max_indexes = max_indexes
+        self.packets = OrderedDict()
+        self.indexes = OrderedDict()
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.index_hits = 0
+        self.index_misses = 0
+
+    def _index_signature(self, race_path):
+        manifest = artefact_path(race_path, "dedup")
+        manifest_mtime = (
+            os.stat(manifest).st_mtime_ns if os.path.exists(manifest) else None
+        )
+        return os.stat(race_path).st_mtime_ns, manifest_mtime
+
+    def entries(self, race_path):
+        signature = self._index_signature(race_path)
+        with self.lock:
+            cached = self.indexes.get(race_path)
+            if cached and cached[0] == signature:
+                self.indexes.move_to_end(race_path)
+                self.index_hits += 1
+                return cached[1]
+            self.index_misses += 1
+
+        entries = list_packet_entries(race_path)
+        with self.lock:
+            self.indexes[race_path] = (signature, entries)
+            self.indexes.move_to_end(race_path)
+            while len(self.indexes) > self.max_indexes:
+                self.indexes.popitem(last=False)
+        return entries
+
+    def _decode_file(self, file_path):
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return None, 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if codec.BACKEND == "orjson":
+                    view = memoryview(mm)
+                    try:
+                        data = codec.loads(view)
+                    finally:
+                        view.release()
+                else:
+                    data = codec.loads(mm[:])
+        if isinstance(data, list) and len(data) > 0:
+            return data[0], size
+        if isinstance(data, dict):
+            return data, size
+        return None, size
+
+    def load(self, race_path, file_name):
+        key = (race_path, file_name)
+        with self.lock:
+            cached = self.packets.get(key)
+            if cached is not None:
+                self.packets.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        packet, size = self._decode_file(os.path.join(race_path, file_name))
+        size *= DECODED_SIZE_FACTOR
+        if size > self.max_bytes:
+            return packet
+        with self.lock:
+            if key not in self.packets:
+                self.packets[key] = (packet, size)
+                self.cached_bytes += size
+            while self.cached_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.packets.popitem(last=False)
+                self.cached_bytes -= evicted_size
+                self.evictions += 1
+        return packet
+
+    def get_packet(self, race_path, ts):
+        entries = self.entries(race_path)
+        index = bisect.bisect_left(entries, (ts,))
+        if index < len(entries) and entries[index][0] == ts:
+            return self.load(race_path, entries[index][1])
+        return None
+
+    def iter_packets(self, race_path, after_ts=None, include_empty=False):
+        entries = self.entries(race_path)
+        start = 0 if after_ts is None else bisect.bisect_left(entries, (after_ts + 1,))
+        previous_name = packet = None
+        for ts, file_name in entries[start:]:
+            # Deduplicated timestamps point at an earlier file, so consecutive
+            # references reuse the packet that was just loaded.
+            if file_name != previous_name:
+                packet = self.load(race_path, file_name)
+                previous_name = file_name
+            if packet is not None or include_empty:
+                yield ts, packet
+
+    def invalidate(self, race_path):
+        with self.lock:
+            self.indexes.pop(race_path, None)
+            for key in [key for key in self.packets if key[0] == race_path]:
+                self.cached_bytes -= self.packets.pop(key)[1]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "cached_packets": len(self.packets),
+                "cached_bytes": self.cached_bytes,
+                "max_bytes": self.max_bytes,
+                "index_hits": self.index_hits,
+                "index_misses": self.index_misses,
+                "cached_indexes": len(self.indexes),
+            }
+
+
+_shared_reader = None
+
+
+def get_reader():
+    global _shared_reader
+    if _shared_reader is None:
+        # Single-pass scans, including every pool worker, read each packet
+        # once, so decoded packets are only kept when a caller asks for it.
+        max_bytes = int(os.environ.get("SAILGP_CACHE_BYTES", 0))
+        _shared_reader = ArchiveReader(max_bytes=max_bytes)
+    return _shared_reader
+
+
+def enable_packet_cache(max_bytes=DEFAULT_MAX_BYTES):
+    reader = get_reader()
+    if "SAILGP_CACHE_BYTES" not in os.environ:
+        reader.max_bytes = max_bytes
+    return reader
+
+
+def print_stats(stats):
+    print(
+        f"Packet cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_rate'] * 100:.1f}% hit rate), {stats['evictions']} evictions"
+    )
+    print(
+        f"  {stats['cached_packets']} packets, "
+        f"{stats['cached_bytes'] / 1024 / 1024:.1f}/"
+        f"{stats['max_bytes'] / 1024 / 1024:.1f} MiB"
+    )
+    print(
+        f"Race indexes: {stats['index_hits']} hits, {stats['index_misses']} misses, "
+        f"{stats['cached_indexes']} cached"
+    )
+
+
+def main():
+    # Run as a script this module is __main__, so use the reader instance the
+    # tools share through the importable module.
+    import archive_reader
+    from compute_leaderboards import compute_race_leaderboard
+    from main import get_all_downloaded_races
+    from transitions import extract_transitions
+
+    parser = argparse.ArgumentParser(
+        description="Run the packet-reading passes in one process and report cache use"
+    )
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--season")
+    args = parser.parse_args()
+
+    archive_reader.enable_packet_cache()
+    for race in get_all_downloaded_races(args.data_dir):
+        if args.season and race["season"] != args.season:
+            continue
+        extract_transitions(race["full_path"])
+        compute_race_leaderboard(race["full_path"])
+    print_stats(archive_reader.get_reader().stats())
+
+
+if __name__ == "__main__":
+    main()
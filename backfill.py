@@ -0,0 +1,335 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from catalog import connect_catalog, update_race
+from download_events import (
+    DATA_DIR,
+    build_event_races,
+    load_raw_data,
+    race_folder_path,
+    run_download,
+)
+from download_planner import plan_downloads, print_plan
+
+QUEUE_PATH = "backfill-queue.sqlite"
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 15
+MAX_ATTEMPTS = 3
+
+
+def connect(queue_path):
+    conn = sqlite3.connect(queue_path, timeout=30, isolation_level=None)
+    # Workers on other hosts share the queue over a network filesystem, where
+    # WAL's shared-memory index doesn't work; the rollback journal relies only
+    # on file locks. Queues created in WAL mode are switched back here.
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS units (
+            id INTEGER PRIMARY KEY,
+            key TEXT UNIQUE NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            lease_expires REAL,
+            packets INTEGER,
+            error TEXT,
+            updated REAL
+        )
+        """
+    )
+    return conn
+
+
+def slice_race(race_info, slice_ms):
+    if not slice_ms or race_info["end_ts"] - race_info["start_ts"] <= slice_ms:
+        return [race_info]
+    slices = []
+    start_ts = race_info["start_ts"]
+    while start_ts <= race_info["end_ts"]:
+        end_ts = min(start_ts + slice_ms - 500, race_info["end_ts"])
+        slices.append(
+            dict(
+                race_info,
+                start_ts=start_ts,
+                end_ts=end_ts,
+                race_start_ts=race_info["start_ts"],
+                race_end_ts=race_info["end_ts"],
+            )
+        )
+        start_ts = end_ts + 500
+    return slices
+
+
+def unit_key(race_info):
+    return (
+        f"{race_info['season']}/{race_info['city']}/day_{race_info['day_num']}/"
+        f"{race_info['race_folder']}@{race_info['start_ts']}-{race_info['end_ts']}"
+    )
+
+
+def expand_schedule(raw_data, seasons=None, slice_ms=None):
+    units = []
+    for season_id, season_data in raw_data.items():
+        if seasons and season_id not in seasons:
+            continue
+        for event_id, event_data in season_data.get("events", {}).items():
+            for race_info in build_event_races(season_id, event_id, event_data):
+                units.extend(slice_race(race_info, slice_ms))
+    return units
+
+
+def enqueue(conn, units):
+    now = time.time()
+    before = conn.total_changes
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(
+        "INSERT OR IGNORE INTO units (key, payload, updated) VALUES (?, ?, ?)",
+        [(unit_key(unit), json.dumps(unit), now) for unit in units],
+    )
+    conn.execute("COMMIT")
+    return conn.total_changes - before
+
+
+def expire_leases(conn, now):
+    # A worker that dies on its last attempt leaves a lease nobody may take
+    # over; without this the unit would stay leased forever.
+    conn.execute(
+        """
+        UPDATE units
+        SET status = 'failed', lease_expires = NULL, updated = ?,
+            error = COALESCE(error, 'lease expired on final attempt')
+        WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+        """,
+        (now, now, MAX_ATTEMPTS),
+    )
+
+
+def lease_unit(conn, worker):
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        expire_leases(conn, now)
+        row = conn.execute(
+            """
+            SELECT id, key, payload, attempts FROM units
+            WHERE status = 'pending'
+               OR (status = 'leased' AND lease_expires < ? AND attempts < ?)
+            ORDER BY id LIMIT 1
+            """,
+            (now, MAX_ATTEMPTS),
+        ).fetchone()
+        if row:
+            conn.execute(
+                """
+                UPDATE units
+                SET status = 'leased', worker = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated = ?
+                WHERE id = ?
+                """,
+                (worker, now + LEASE_SECONDS, now, row[0]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+
+def heartbeat(conn, unit_id, worker):
+    conn.execute(
+        """
+        UPDATE units SET lease_expires = ?, updated = ?
+        WHERE id = ? AND worker = ? AND status = 'leased'
+        """,
+        (time.time() + LEASE_SECONDS, time.time(), unit_id, worker),
+    )
+
+
+def complete_unit(conn, unit_id, worker, packets):
+    conn.execute(
+        """
+        UPDATE units SET status = 'done', packets = ?, error = NULL,
+            lease_expires = NULL, updated = ?
+        WHERE id = ? AND worker = ?
+        """,
+        (packets, time.time(), unit_id, worker),
+    )
+
+
+def fail_unit(conn, unit_id, worker, attempts, error):
+    status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+    conn.execute(
+        """
+        UPDATE units SET status = ?, error = ?, lease_expires = NULL, updated = ?
+        WHERE id = ? AND worker = ?
+        """,
+        (status, error, time.time(), unit_id, worker),
+    )
+    return status
+
+
+def settle_race(conn, race_info):
+    # The catalog status of a sliced race is only final once every one of
+    # its units is done, or one has failed for good.
+    prefix = unit_key(race_info).split("@")[0] + "@"
+    counts = dict(
+        conn.execute(
+            """
+            SELECT status, COUNT(*) FROM units
+            WHERE substr(key, 1, ?) = ? GROUP BY status
+            """,
+            (len(prefix), prefix),
+        )
+    )
+    if counts.get("failed"):
+        status = "interrupted"
+    elif set(counts) == {"done"}:
+        status = "downloaded"
+    else:
+        return None
+    catalog = connect_catalog(DATA_DIR)
+    update_race(catalog, DATA_DIR, race_folder_path(race_info), status)
+    catalog.close()
+    return status
+
+
+def queue_counts(conn):
+    return dict(conn.execute("SELECT status, COUNT(*) FROM units GROUP BY status"))
+
+
+def active_leases(conn):
+    return conn.execute(
+        """
+        SELECT COUNT(*) FROM units
+        WHERE status = 'leased' AND (lease_expires >= ? OR attempts < ?)
+        """,
+        (time.time(), MAX_ATTEMPTS),
+    ).fetchone()[0]
+
+
+def run_worker(queue_path, worker):
+    conn = connect(queue_path)
+    processed = 0
+    while True:
+        row = lease_unit(conn, worker)
+        if not row:
+            if not active_leases(conn):
+                break
+            # Another worker still holds a lease; wait in case it expires.
+            time.sleep(HEARTBEAT_SECONDS)
+            continue
+
+        unit_id, key, payload, attempts = row
+        race_info = json.loads(payload)
+        print(f"\n[{worker}] ▶️  {key} (attempt {attempts + 1})")
+
+        stop = threading.Event()
+
+        def keep_alive():
+            beat_conn = connect(queue_path)
+            while not stop.wait(HEARTBEAT_SECONDS):
+                heartbeat(beat_conn, unit_id, worker)
+            beat_conn.close()
+
+        beat_thread = threading.Thread(target=keep_alive, daemon=True)
+        beat_thread.start()
+        try:
+            packets = run_download(race_info, strict=True)
+        except Exception as e:
+            stop.set()
+            beat_thread.join()
+            status = fail_unit(conn, unit_id, worker, attempts + 1, str(e))
+            print(f"\n[{worker}] ❌ {key}: {e} ({status})")
+            settle_race(conn, race_info)
+            continue
+        stop.set()
+        beat_thread.join()
+        complete_unit(conn, unit_id, worker, packets)
+        settle_race(conn, race_info)
+        processed += 1
+
+    conn.close()
+    print(f"\n[{worker}] ✨ Queue drained, {processed} units processed")
+
+
+def print_status(conn):
+    expire_leases(conn, time.time())
+    counts = queue_counts(conn)
+    total = sum(counts.values())
+    packets = conn.execute(
+        "SELECT COALESCE(SUM(packets), 0) FROM units WHERE status = 'done'"
+    ).fetchone()[0]
+    summary = ", ".join(f"{status}: {count}" for status, count in sorted(counts.items()))
+    print(f"Units: {total} ({summary}), packets downloaded: {packets}")
+    for key, worker, error in conn.execute(
+        "SELECT key, worker, error FROM units WHERE status = 'failed'"
+    ):
+        print(f"  failed {key} on {worker}: {error}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Distributed backfill: coordinator fills a queue, workers drain it"
+    )
+    parser.add_argument("--queue", default=QUEUE_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinate_parser = subparsers.add_parser("coordinate")
+    coordinate_parser.add_argument("--season", action="append", dest="seasons")
+    coordinate_parser.add_argument(
+        "--slice-minutes",
+        type=float,
+        help="Split races into time slices of this length",
+    )
+    coordinate_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Expected number of workers, used for the ETA",
+    )
+    coordinate_parser.add_argument(
+        "--wait", action="store_true", help="Report progress until the queue drains"
+    )
+
+    worker_parser = subparsers.add_parser("work")
+    worker_parser.add_argument(
+        "--worker-id", default=f"{socket.gethostname()}-{os.getpid()}"
+    )
+
+    subparsers.add_parser("status")
+    args = parser.parse_args()
+
+    if args.command == "work":
+        run_worker(args.queue, args.worker_id)
+        return
+
+    conn = connect(args.queue)
+    if args.command == "coordinate":
+        slice_ms = int(args.slice_minutes * 60000) if args.slice_minutes else None
+        units = expand_schedule(load_raw_data(), args.seasons, slice_ms)
+        # Workers lease units in id order, so queue the longest ones first.
+        plan = plan_downloads(units, args.workers)
+        units = [estimate["race"] for estimate in plan["order"]]
+        print_plan(plan)
+        added = enqueue(conn, units)
+        print(f"📦 {len(units)} work units in schedule, {added} newly queued")
+        while args.wait:
+            counts = print_status(conn)
+            if not counts.get("pending") and not active_leases(conn):
+                break
+            time.sleep(HEARTBEAT_SECONDS)
+    else:
+        print_status(conn)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
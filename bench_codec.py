@@ -0,0 +1,94 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import codec
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def read_all(paths):
+    contents = []
+    for path in paths:
+        with open(path, "rb") as f:
+            contents.append(f.read())
+    return contents
+
+
+def bench_case(name, stdlib_fn, codec_fn, repeat):
+    stdlib_s = best_of(stdlib_fn, repeat)
+    codec_s = best_of(codec_fn, repeat)
+    speedup = stdlib_s / codec_s if codec_s else float("inf")
+    print(
+        f"{name:<42} {stdlib_s * 1000:>10.1f} {codec_s * 1000:>10.1f} {speedup:>8.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the stdlib json module with the codec backend"
+    )
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--packets", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Codec backend: {codec.BACKEND}")
+    print(f"{'entry point / operation':<42} {'json ms':>10} {'codec ms':>10} {'gain':>9}")
+
+    packet_paths = sorted(
+        glob.glob(os.path.join(args.data_dir, "*", "*", "*", "*", "*.json"))
+    )[: args.packets]
+    if packet_paths:
+        packets = read_all(packet_paths)
+        bench_case(
+            f"main/packets: parse {len(packets)} packets",
+            lambda: [json.loads(p) for p in packets],
+            lambda: [codec.loads(p) for p in packets],
+            args.repeat,
+        )
+
+    if os.path.exists("races-data.json"):
+        (races_data_raw,) = read_all(["races-data.json"])
+        races_data = json.loads(races_data_raw)
+        bench_case(
+            "main/download_events: load races-data",
+            lambda: json.loads(races_data_raw),
+            lambda: codec.loads(races_data_raw),
+            args.repeat,
+        )
+        bench_case(
+            "process_events_by_season: write races-data",
+            lambda: json.dumps(races_data, indent=2),
+            lambda: codec.dumps(races_data, indent=2),
+            args.repeat,
+        )
+        if json.dumps(races_data, indent=2) != codec.dumps(races_data, indent=2):
+            print("  ⚠️  races-data.json output differs between backends")
+
+    for path in sorted(glob.glob(os.path.join("races-info", "season_*.json"))):
+        (raw,) = read_all([path])
+        data = json.loads(raw)
+        bench_case(
+            f"json_formatter: {os.path.basename(path)}",
+            lambda: json.dumps(json.loads(raw), indent=2, sort_keys=True),
+            lambda: codec.dumps(codec.loads(raw), indent=2, sort_keys=True),
+            args.repeat,
+        )
+        if json.dumps(data, indent=2, sort_keys=True) != codec.dumps(
+            data, indent=2, sort_keys=True
+        ):
+            print(f"  ⚠️  {path} output differs between backends")
+
+
+if __name__ == "__main__":
+    main()
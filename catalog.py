@@ -0,0 +1,237 @@
+import argparse
+import os
+import sqlite3
+import time
+
+from packets import list_packet_entries, list_packet_files
+
+CATALOG_FILE = "catalog.sqlite"
+RACE_COLUMNS = (
+    "path",
+    "season",
+    "event",
+    "day",
+    "race_folder",
+    "packet_count",
+    "first_ts",
+    "first_file",
+    "last_ts",
+    "last_file",
+    "byte_size",
+    "status",
+    "updated",
+)
+
+
+def catalog_path(data_dir):
+    return os.path.join(data_dir, CATALOG_FILE)
+
+
+def walk_race_folders(data_dir):
+    race_paths = []
+    for season_folder in sorted(os.listdir(data_dir)):
+        season_path = os.path.join(data_dir, season_folder)
+        if not os.path.isdir(season_path):
+            continue
+        for event_folder in sorted(os.listdir(season_path)):
+            event_path = os.path.join(season_path, event_folder)
+            if not os.path.isdir(event_path):
+                continue
+            for day_folder in sorted(os.listdir(event_path)):
+                day_path = os.path.join(event_path, day_folder)
+                if not os.path.isdir(day_path):
+                    continue
+                for race_folder in sorted(os.listdir(day_path)):
+                    race_path = os.path.join(day_path, race_folder)
+                    if os.path.isdir(race_path):
+                        race_paths.append(race_path)
+    return race_paths
+
+
+def scan_race_folder(race_path):
+    entries = list_packet_entries(race_path)
+    byte_size = sum(
+        os.path.getsize(os.path.join(race_path, name))
+        for name in list_packet_files(race_path)
+    )
+    return {
+        "packet_count": len(entries),
+        "first_ts": entries[0][0] if entries else None,
+        "first_file": entries[0][1] if entries else None,
+        "last_ts": entries[-1][0] if entries else None,
+        "last_file": entries[-1][1] if entries else None,
+        "byte_size": byte_size,
+    }
+
+
+def connect_catalog(data_dir, bootstrap=True):
+    os.makedirs(data_dir, exist_ok=True)
+    conn = sqlite3.connect(catalog_path(data_dir), timeout=30)
+    conn.row_factory = sqlite3.Row
+    with conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS races (
+                path TEXT PRIMARY KEY,
+                season TEXT NOT NULL,
+                event TEXT NOT NULL,
+                day TEXT NOT NULL,
+                race_folder TEXT NOT NULL,
+                packet_count INTEGER NOT NULL DEFAULT 0,
+                first_ts INTEGER,
+                first_file TEXT,
+                last_ts INTEGER,
+                last_file TEXT,
+                byte_size INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+    # A new catalog has to learn about races downloaded before it existed,
+    # otherwise readers would only see races written since.
+    if bootstrap and not conn.execute(
+        "SELECT 1 FROM meta WHERE key = 'scanned'"
+    ).fetchone():
+        rebuild_catalog(conn, data_dir)
+    return conn
+
+
+def race_path_parts(data_dir, race_path):
+    season, event, day, race_folder = os.path.relpath(race_path, data_dir).split(
+        os.sep
+    )
+    return season, event, day, race_folder
+
+
+def race_row(data_dir, race_path, status, stats=None):
+    if stats is None:
+        stats = scan_race_folder(race_path)
+    season, event, day, race_folder = race_path_parts(data_dir, race_path)
+    return dict(
+        stats,
+        path=os.path.join(data_dir, season, event, day, race_folder),
+        season=season,
+        event=event,
+        day=day,
+        race_folder=race_folder,
+        status=status,
+        updated=time.time(),
+    )
+
+
+def upsert_races(conn, rows):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO races ({', '.join(RACE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(RACE_COLUMNS))})",
+        [[row[column] for column in RACE_COLUMNS] for row in rows],
+    )
+
+
+def update_race(conn, data_dir, race_path, status, stats=None):
+    row = race_row(data_dir, race_path, status, stats)
+    with conn:
+        upsert_races(conn, [row])
+    return row
+
+
+def record_progress(conn, data_dir, race_path, packet_count, last_ts, byte_size):
+    season, event, day, race_folder = race_path_parts(data_dir, race_path)
+    path = os.path.join(data_dir, season, event, day, race_folder)
+    with conn:
+        updated = conn.execute(
+            """
+            UPDATE races SET packet_count = ?, last_ts = ?, byte_size = ?,
+                status = 'downloading', updated = ?
+            WHERE path = ?
+            """,
+            (packet_count, last_ts, byte_size, time.time(), path),
+        ).rowcount
+    if not updated:
+        update_race(conn, data_dir, race_path, "downloading")
+
+
+def get_race(conn, race_path):
+    row = conn.execute("SELECT * FROM races WHERE path = ?", (race_path,)).fetchone()
+    return dict(row) if row else None
+
+
+def list_races(data_dir, season=None, status=None):
+    if not os.path.isdir(data_dir):
+        return []
+    conn = connect_catalog(data_dir)
+    query = "SELECT * FROM races WHERE 1 = 1"
+    params = []
+    if season:
+        query += " AND season = ?"
+        params.append(season)
+    if status:
+        query += " AND status = ?"
+        params.append(status)
+    query += " ORDER BY season, event, day, race_folder"
+    rows = [dict(row) for row in conn.execute(query, params)]
+    conn.close()
+    return rows
+
+
+def rebuild_catalog(conn, data_dir):
+    race_paths = walk_race_folders(data_dir)
+    existing = {
+        row["path"]: row["status"]
+        for row in conn.execute("SELECT path, status FROM races")
+    }
+    rows = [
+        race_row(data_dir, race_path, existing.get(race_path, "downloaded"))
+        for race_path in race_paths
+    ]
+    with conn:
+        upsert_races(conn, rows)
+        conn.executemany(
+            "DELETE FROM races WHERE path = ?",
+            [(path,) for path in set(existing) - set(race_paths)],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('scanned', ?)",
+            (str(time.time()),),
+        )
+    return len(race_paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive catalog of race folders")
+    parser.add_argument("--data-dir", default="data")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild")
+    list_parser = subparsers.add_parser("list")
+    list_parser.add_argument("--season")
+    list_parser.add_argument("--status")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        conn = connect_catalog(args.data_dir, bootstrap=False)
+        count = rebuild_catalog(conn, args.data_dir)
+        conn.close()
+        print(f"Catalog rebuilt: {count} races")
+        return
+
+    started = time.perf_counter()
+    races = list_races(args.data_dir, args.season, args.status)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for race in races:
+        print(
+            f"{race['path']}: {race['packet_count']} packets, "
+            f"{race['first_ts']} -> {race['last_ts']}, "
+            f"{race['byte_size'] / 1024:.1f} KiB, {race['status']}"
+        )
+    total_bytes = sum(race["byte_size"] for race in races)
+    print(
+        f"\n{len(races)} races, {total_bytes / 1024 / 1024:.1f} MiB "
+        f"({elapsed_ms:.1f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
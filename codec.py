@@ -0,0 +1,82 @@
+import json
+import math
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = os.environ.get("SAILGP_JSON_BACKEND", "orjson" if orjson else "json")
+if BACKEND == "orjson" and orjson is None:
+    BACKEND = "json"
+
+# ensure_ascii also escapes DEL, which orjson writes raw.
+NON_ASCII = re.compile(r"[^\x00-\x7e]")
+
+
+def loads(data):
+    if BACKEND == "orjson":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity and very large integers are accepted by the stdlib
+            # only; genuinely invalid input raises from it as before.
+            pass
+    if isinstance(data, memoryview):
+        # json.loads only takes str/bytes (the archive reader passes mmaps).
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def load(fp):
+    return loads(fp.read())
+
+
+def _escape_char(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return "\\u{:04x}\\u{:04x}".format(
+            0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF)
+        )
+    return "\\u{:04x}".format(code)
+
+
+def _has_unportable_floats(obj):
+    # orjson and the stdlib disagree on exponent notation and non-finite
+    # values, so any float that would use them goes through the stdlib.
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, float):
+            magnitude = abs(value)
+            if not math.isfinite(value) or magnitude >= 1e16 or 0 < magnitude < 1e-4:
+                return True
+    return False
+
+
+def dumps(obj, indent=None, sort_keys=False):
+    """Serialize exactly like ``json.dumps(obj, indent=indent, sort_keys=sort_keys)``."""
+    if BACKEND == "orjson" and indent == 2 and not _has_unportable_floats(obj):
+        option = orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            text = orjson.dumps(obj, option=option).decode("utf-8")
+        except TypeError:
+            pass
+        else:
+            if text.isascii() and "\x7f" not in text:
+                return text
+            return NON_ASCII.sub(_escape_char, text)
+    return json.dumps(obj, indent=indent, sort_keys=sort_keys)
+
+
+def dump(obj, fp, indent=None, sort_keys=False):
+    fp.write(dumps(obj, indent=indent, sort_keys=sort_keys))
@@ -0,0 +1,253 @@
+import argparse
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import connect_catalog, update_race
+from dedup import load_manifest, manifest_lock
+from packets import (
+    artefact_path,
+    list_packet_entries,
+    list_packet_files,
+    read_artefact,
+    write_artefact,
+)
+from transitions import (
+    RACE_ENTITY,
+    boat_entity,
+    build_transitions,
+    extract_transitions,
+    first_transition,
+    load_transitions,
+)
+
+PRE_START_STATUSES = ("PreStart", "Prestart", "Scheduled", "Waiting", "Postponed")
+TERMINATED_STATUS = "Terminated"
+DEFAULT_MARGIN_SECONDS = 30
+COLD_DIR = "cold"
+
+
+def find_live_span(log, pre_start_statuses=PRE_START_STATUSES):
+    # main.py validates a race by its lead boat being Terminated in the last
+    # packet, and the lead boat may only turn Terminated after the race
+    # status does. The log doesn't record which boat leads, so the span runs
+    # until every boat that terminates has done so.
+    boat_ends = {}
+    for ts, entity, old, new in log["transitions"]:
+        if entity.startswith(boat_entity("")) and new == TERMINATED_STATUS:
+            boat_ends.setdefault(entity, ts)
+    candidates = list(boat_ends.values())
+    race_end = first_transition(log, RACE_ENTITY, TERMINATED_STATUS)
+    if race_end is not None:
+        candidates.append(race_end)
+    if not candidates:
+        return None
+    end_ts = max(candidates)
+
+    start_ts = log["first_ts"]
+    for ts, entity, old, new in log["transitions"]:
+        if entity == RACE_ENTITY and new not in pre_start_statuses:
+            start_ts = ts
+            break
+    return start_ts, end_ts
+
+
+def plan_race(race_path, margin_ms, pre_start_statuses, dry_run=False):
+    if dry_run:
+        # A dry run must not write anything, including a refreshed log.
+        log = load_transitions(race_path) or extract_transitions(race_path)
+    else:
+        log, _ = build_transitions(race_path)
+    span = find_live_span(log, pre_start_statuses)
+    if span is None:
+        return None
+    keep_from, keep_to = span[0] - margin_ms, span[1] + margin_ms
+
+    entries = list_packet_entries(race_path)
+    kept = [(ts, name) for ts, name in entries if keep_from <= ts <= keep_to]
+    # A kept timestamp may reference a file outside the window through the
+    # dedup manifest, and that file has to stay.
+    needed = {name for _, name in kept}
+    removable = [name for name in list_packet_files(race_path) if name not in needed]
+    return {
+        "race_path": race_path,
+        "original_first_ts": entries[0][0] if entries else None,
+        "original_last_ts": entries[-1][0] if entries else None,
+        "live_start_ts": span[0],
+        "live_end_ts": span[1],
+        "kept_from": keep_from,
+        "kept_to": keep_to,
+        "removed_packets": len(entries) - len(kept),
+        "removed_files": removable,
+        "bytes_reclaimed": sum(
+            os.path.getsize(os.path.join(race_path, name)) for name in removable
+        ),
+    }
+
+
+def apply_plan(plan, mode, data_dir, cold_dir):
+    race_path = plan["race_path"]
+    if mode == "archive":
+        target = os.path.join(cold_dir, os.path.relpath(race_path, data_dir))
+        os.makedirs(target, exist_ok=True)
+    for name in plan["removed_files"]:
+        source = os.path.join(race_path, name)
+        if mode == "archive":
+            shutil.move(source, os.path.join(target, name))
+        else:
+            os.remove(source)
+
+    with manifest_lock(race_path):
+        manifest = load_manifest(race_path)
+        if manifest["refs"]:
+            manifest["refs"] = {
+                ts: source_ts
+                for ts, source_ts in manifest["refs"].items()
+                if plan["kept_from"] <= int(ts) <= plan["kept_to"]
+            }
+            if manifest["refs"]:
+                write_artefact(race_path, "dedup", manifest, indent=None)
+            else:
+                os.remove(artefact_path(race_path, "dedup"))
+
+    # Repeated compactions keep the timestamps the race originally had.
+    previous = read_artefact(race_path, "compaction")
+    record = {k: v for k, v in plan.items() if k not in ("race_path", "removed_files")}
+    record["mode"] = mode
+    if previous:
+        record["original_first_ts"] = previous["original_first_ts"]
+        record["original_last_ts"] = previous["original_last_ts"]
+        record["removed_packets"] += previous["removed_packets"]
+        record["bytes_reclaimed"] += previous["bytes_reclaimed"]
+    write_artefact(race_path, "compaction", record)
+    build_transitions(race_path, force=True)
+
+
+def compact_race(race_path, margin_ms, mode, data_dir, cold_dir, dry_run, pre_start):
+    plan = plan_race(race_path, margin_ms, pre_start, dry_run)
+    if plan and plan["removed_packets"] and not dry_run:
+        apply_plan(plan, mode, data_dir, cold_dir)
+    return plan
+
+
+def refresh_derived(data_dir, races):
+    # Leaderboards carry no source signature and venue indexes are only
+    # refreshed on request, so both are brought up to date here.
+    from compute_leaderboards import find_expected_race, process_race
+    from main import load_races_data
+    from spatial_index import build_indexes, venue_index_path
+
+    races_data = load_races_data() if os.path.exists("races-data.json") else None
+    for race in races:
+        leaderboard = artefact_path(race["full_path"], "leaderboard")
+        if not os.path.exists(leaderboard):
+            continue
+        if races_data is None:
+            # The official check can't be redone without the schedule.
+            os.remove(leaderboard)
+            continue
+        process_race(
+            race,
+            *find_expected_race(
+                races_data, race["season"], race["event"], race["race_folder"]
+            ),
+        )
+
+    venues = {
+        race["event"]
+        for race in races
+        if os.path.exists(venue_index_path(data_dir, race["event"]))
+    }
+    if venues:
+        build_indexes(data_dir, venues=venues)
+
+
+def main():
+    from main import get_all_downloaded_races
+
+    parser = argparse.ArgumentParser(
+        description="Trim packets outside each race's live span"
+    )
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--season")
+    parser.add_argument(
+        "--margin-seconds", type=float, default=DEFAULT_MARGIN_SECONDS
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("trim", "archive"),
+        default="archive",
+        help="Delete excess packets or move them under --cold-dir",
+    )
+    parser.add_argument("--cold-dir", default=COLD_DIR)
+    parser.add_argument(
+        "--pre-start-status",
+        action="append",
+        help="Race status that counts as before the start (repeatable)",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    margin_ms = int(args.margin_seconds * 1000)
+    pre_start = tuple(args.pre_start_status or PRE_START_STATUSES)
+    races = [
+        r
+        for r in get_all_downloaded_races(args.data_dir)
+        if not args.season or r["season"] == args.season
+    ]
+
+    catalog = connect_catalog(args.data_dir)
+    total_bytes = 0
+    total_packets = 0
+    skipped = 0
+    compacted = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(
+                compact_race,
+                race["full_path"],
+                margin_ms,
+                args.mode,
+                args.data_dir,
+                args.cold_dir,
+                args.dry_run,
+                pre_start,
+            )
+            for race in races
+        ]
+        for race, future in zip(races, futures):
+            name = f"{race['season']}/{race['event']}/{race['race_folder']}"
+            try:
+                plan = future.result()
+            except Exception as e:
+                print(f"  {name}: Error: {e}")
+                continue
+            if plan is None:
+                skipped += 1
+                print(f"  {name}: no Terminated status, skipped")
+                continue
+            if not plan["removed_packets"]:
+                continue
+            total_bytes += plan["bytes_reclaimed"]
+            total_packets += plan["removed_packets"]
+            print(
+                f"  {name}: {plan['removed_packets']} packets outside "
+                f"{plan['kept_from']} -> {plan['kept_to']}, "
+                f"{plan['bytes_reclaimed'] / 1024:.1f} KiB"
+            )
+            if not args.dry_run:
+                update_race(catalog, args.data_dir, race["full_path"], race["status"])
+                compacted.append(race)
+    catalog.close()
+    refresh_derived(args.data_dir, compacted)
+
+    action = "reclaimable" if args.dry_run else "reclaimed"
+    print(
+        f"\n{total_packets} packets, {total_bytes / 1024 / 1024:.1f} MiB {action} "
+        f"across {len(races)} races ({skipped} skipped)"
+    )
+
+
+if __name__ == "__main__":
+    main()
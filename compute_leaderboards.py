@@ -0,0 +1,224 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from archive_reader import get_reader
+from main import get_all_downloaded_races, load_races_data, normalize_race_name
+from packets import (
+    FINISHED_STATUSES,
+    LEG_KEYS,
+    POSITION_KEYS,
+    get_boat_id,
+    get_boat_records,
+    get_field,
+    write_artefact,
+)
+
+
+def scan_race(race_path):
+    gate_times = {}
+    finish_times = {}
+    last_leg = {}
+    last_position = {}
+    packet_count = 0
+
+    for ts, packet in get_reader().iter_packets(race_path):
+        packet_count += 1
+        for index, boat in enumerate(get_boat_records(packet)):
+            boat_id = get_boat_id(boat, index)
+            leg = get_field(boat, LEG_KEYS)
+            position = get_field(boat, POSITION_KEYS)
+            if position is not None:
+                last_position[boat_id] = position
+
+            if isinstance(leg, (int, float)):
+                leg = int(leg)
+                previous_leg = last_leg.get(boat_id)
+                if previous_leg is not None and leg > previous_leg:
+                    for gate in range(previous_leg, leg):
+                        gate_times.setdefault(gate, {}).setdefault(boat_id, ts)
+                last_leg[boat_id] = leg if previous_leg is None else max(
+                    leg, previous_leg
+                )
+
+            status = boat.get("boatStatus")
+            if status in FINISHED_STATUSES:
+                finish_times.setdefault(status, {}).setdefault(boat_id, ts)
+
+    # Every boat turns Terminated together when the race ends, so that only
+    # counts as a finish for races that never report Finished.
+    finish_status = next((s for s in FINISHED_STATUSES if s in finish_times), None)
+    return {
+        "packet_count": packet_count,
+        "gate_times": gate_times,
+        "finish_times": finish_times.get(finish_status, {}),
+        "last_leg": last_leg,
+        "last_position": last_position,
+    }
+
+
+def numeric_id(boat_id):
+    return (0, int(boat_id), "") if boat_id.isdigit() else (1, 0, boat_id)
+
+
+def race_state_key(scan, boat_id):
+    return (
+        -scan["last_leg"].get(boat_id, 0),
+        scan["last_position"].get(boat_id, float("inf")),
+        numeric_id(boat_id),
+    )
+
+
+def rank_times(times, scan):
+    # Packets arrive every 500 ms, so several boats often share a timestamp;
+    # those are ordered by how far along the race they got.
+    ordered = sorted(
+        times.items(), key=lambda item: (item[1], race_state_key(scan, item[0]))
+    )
+    if not ordered:
+        return []
+    leader_ts = ordered[0][1]
+    previous_ts = leader_ts
+    ranks = []
+    for rank, (boat_id, ts) in enumerate(ordered, 1):
+        ranks.append(
+            {
+                "rank": rank,
+                "boat_id": boat_id,
+                "ts": ts,
+                "delta_to_leader_ms": ts - leader_ts,
+                "delta_to_previous_ms": ts - previous_ts,
+            }
+        )
+        previous_ts = ts
+    return ranks
+
+
+def build_finish_order(scan):
+    finished = rank_times(scan["finish_times"], scan)
+    finished_ids = {entry["boat_id"] for entry in finished}
+    unfinished = [
+        boat_id
+        for boat_id in set(scan["last_leg"]) | set(scan["last_position"])
+        if boat_id not in finished_ids
+    ]
+    unfinished.sort(key=lambda boat_id: race_state_key(scan, boat_id))
+    order = [entry["boat_id"] for entry in finished] + unfinished
+    return order, finished
+
+
+def compute_race_leaderboard(race_path):
+    scan = scan_race(race_path)
+    order, finished = build_finish_order(scan)
+    return {
+        "packet_count": scan["packet_count"],
+        "gates": [
+            {"gate": gate, "ranks": rank_times(times, scan)}
+            for gate, times in sorted(scan["gate_times"].items())
+        ],
+        "finish": finished,
+        "finish_order": order,
+    }
+
+
+def find_expected_race(races_data, season, event, race_folder):
+    event_data = races_data.get(season, {}).get("events", {}).get(event)
+    if not event_data:
+        return None, None
+    race_folder_norm = normalize_race_name(race_folder)
+    for day in event_data.get("days", []):
+        for race in day.get("races", []):
+            if normalize_race_name(race.get("name")) == race_folder_norm:
+                return event_data, race
+    return event_data, None
+
+
+def boat_to_team_map(event_data):
+    mapping = {}
+    for code, team in (event_data or {}).get("teams", {}).items():
+        mapping[code] = code
+        if team.get("boat_id") is not None:
+            mapping[str(team["boat_id"])] = code
+    return mapping
+
+
+def compare_with_official(result, event_data, race):
+    official = sorted(
+        [
+            item
+            for item in (race or {}).get("leaderboard", [])
+            if item.get("pos") is not None and item.get("team_code")
+        ],
+        key=lambda item: item["pos"],
+    )
+    if not official:
+        return {"status": "no_official_leaderboard", "mismatches": []}
+
+    teams = boat_to_team_map(event_data)
+    computed = [teams.get(boat_id, boat_id) for boat_id in result["finish_order"]]
+    mismatches = []
+    for item in official:
+        pos = item["pos"]
+        got = computed[pos - 1] if 0 < pos <= len(computed) else None
+        if got != item["team_code"]:
+            mismatches.append(
+                {"pos": pos, "official": item["team_code"], "computed": got}
+            )
+    return {
+        "status": "match" if not mismatches else "mismatch",
+        "computed_order": computed,
+        "mismatches": mismatches,
+    }
+
+
+def process_race(race, event_data, expected_race):
+    result = compute_race_leaderboard(race["full_path"])
+    result["official_check"] = compare_with_official(result, event_data, expected_race)
+    write_artefact(race["full_path"], "leaderboard", result)
+    return race, result["official_check"]["status"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Derive gate splits and finish order from downloaded packets"
+    )
+    parser.add_argument("season", help="Season folder, e.g. season5")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    races_data = load_races_data()
+    races = [
+        r
+        for r in get_all_downloaded_races(args.data_dir)
+        if r["season"] == args.season
+    ]
+    if not races:
+        print(f"No downloaded races for {args.season}")
+        return
+
+    print(f"Computing leaderboards for {len(races)} races...")
+    counts = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(
+                process_race,
+                race,
+                *find_expected_race(
+                    races_data, race["season"], race["event"], race["race_folder"]
+                ),
+            )
+            for race in races
+        ]
+        for future in futures:
+            race, status = future.result()
+            counts[status] = counts.get(status, 0) + 1
+            print(f"  {race['event']}/{race['race_folder']}: {status}")
+
+    print("\n--- OFFICIAL LEADERBOARD CHECK ---")
+    for status, count in sorted(counts.items()):
+        print(f"{status}: {count}")
+
+
+if __name__ == "__main__":
+    main()
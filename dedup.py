@@ -0,0 +1,148 @@
+import argparse
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+from catalog import connect_catalog, update_race
+from packets import list_packet_files, packet_timestamp, read_artefact, write_artefact
+
+
+def payload_hash(payload):
+    return hashlib.sha1(payload).hexdigest()
+
+
+def load_manifest(race_path):
+    manifest = read_artefact(race_path, "dedup") or {}
+    manifest.setdefault("refs", {})
+    manifest.setdefault("bytes_saved", 0)
+    return manifest
+
+
+@contextmanager
+def manifest_lock(race_path):
+    # Several workers may fill different time slices of the same race, so
+    # manifest updates are read-modify-write under a lock on the race folder.
+    fd = os.open(race_path, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def save_manifest(race_path, refs, bytes_saved):
+    if not refs:
+        return
+    with manifest_lock(race_path):
+        manifest = load_manifest(race_path)
+        manifest["refs"].update(refs)
+        manifest["bytes_saved"] += bytes_saved
+        write_artefact(race_path, "dedup", manifest, indent=None)
+
+
+class PayloadDeduplicator:
+    def __init__(self, race_path):
+        self.race_path = race_path
+        self.refs = {}
+        self.ref_sizes = {}
+        self.last_hash = None
+        self.last_ts = None
+        self.duplicates = 0
+        self.bytes_saved = 0
+        self.unsaved_bytes = 0
+
+    def check(self, ts, payload):
+        digest = payload_hash(payload)
+        if digest == self.last_hash:
+            self.refs[str(ts)] = self.last_ts
+            self.ref_sizes[str(ts)] = len(payload)
+            self.duplicates += 1
+            self.bytes_saved += len(payload)
+            self.unsaved_bytes += len(payload)
+            return self.last_ts
+        self.keep(ts, payload, digest)
+        return None
+
+    def keep(self, ts, payload, digest=None):
+        self.last_hash = digest or payload_hash(payload)
+        self.last_ts = ts
+
+    def drop_missing_sources(self):
+        # After a failed write the source of a reference may never have
+        # reached disk, and a dangling reference breaks every reader.
+        for ts, source_ts in list(self.refs.items()):
+            if not os.path.exists(os.path.join(self.race_path, f"{source_ts}.json")):
+                del self.refs[ts]
+                size = self.ref_sizes.pop(ts)
+                self.duplicates -= 1
+                self.bytes_saved -= size
+                self.unsaved_bytes -= size
+
+    def save(self):
+        save_manifest(self.race_path, self.refs, self.unsaved_bytes)
+        self.refs = {}
+        self.ref_sizes = {}
+        self.unsaved_bytes = 0
+
+
+def dedup_race(race_path, dry_run=False):
+    dedup = PayloadDeduplicator(race_path)
+    referenced = {int(ts) for ts in load_manifest(race_path)["refs"].values()}
+    for file_name in list_packet_files(race_path):
+        file_path = os.path.join(race_path, file_name)
+        with open(file_path, "rb") as f:
+            payload = f.read()
+        ts = packet_timestamp(file_name)
+        if ts in referenced:
+            # Existing references (e.g. from another backfill slice) point at
+            # this file, so it stays and becomes the source for what follows.
+            dedup.keep(ts, payload)
+            continue
+        if dedup.check(ts, payload) is not None:
+            if not dry_run:
+                os.remove(file_path)
+    if not dry_run:
+        dedup.save()
+    return dedup.duplicates, dedup.bytes_saved
+
+
+def main():
+    from main import get_all_downloaded_races
+
+    parser = argparse.ArgumentParser(
+        description="Replace identical consecutive packets with references"
+    )
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--season")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    catalog = connect_catalog(args.data_dir)
+    total_duplicates = 0
+    total_saved = 0
+    for race in get_all_downloaded_races(args.data_dir):
+        if args.season and race["season"] != args.season:
+            continue
+        duplicates, saved = dedup_race(race["full_path"], args.dry_run)
+        if duplicates and not args.dry_run:
+            update_race(catalog, args.data_dir, race["full_path"], race["status"])
+        total_duplicates += duplicates
+        total_saved += saved
+        if duplicates:
+            print(
+                f"  {race['season']}/{race['event']}/{race['race_folder']}: "
+                f"{duplicates} duplicate packets, {saved / 1024:.1f} KiB saved"
+            )
+
+    catalog.close()
+
+    action = "would be saved" if args.dry_run else "saved"
+    print(
+        f"\n{total_duplicates} duplicate packets, "
+        f"{total_saved / 1024 / 1024:.1f} MiB {action}"
+    )
+
+
+if __name__ == "__main__":
+    main()
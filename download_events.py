@@ -1,11 +1,31 @@
 import requests
+import argparse
 import os
+import threading
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-with open("races-data.json", "r") as f:
-    RAW_DATA = json.load(f)
+import codec
+from catalog import connect_catalog, record_progress, update_race
+from dedup import PayloadDeduplicator
+from download_planner import plan_downloads, print_plan
+from packet_writer import PacketWriter, remove_partial_writes
+from profiling import phase
+
+DATA_DIR = "data"
+CATALOG_BATCH = 100
+REQUEST_RETRIES = 4
+RETRY_BACKOFF_SECONDS = 0.25
+CDN_BASE_URL = os.environ.get(
+    "SAILGP_CDN_URL", "https://d3q91bfyfm610o.cloudfront.net"
+)
+STOP_DOWNLOADS = threading.Event()
+
+
+def load_raw_data():
+    with open("races-data.json", "rb") as f:
+        return codec.load(f)
 
 
 def iso_to_unix_ms(iso_str):
@@ -64,43 +84,197 @@ def select_from_list(options, prompt_text, show_count=False):
     return selected
 
 
-def run_download(race_info):
-    path = f"data/{race_info['season']}/{race_info['city']}/day_{race_info['day_num']}/{race_info['race_folder']}"
+def fetch_packet(url, retries=REQUEST_RETRIES):
+    # Dropped connections and server errors are retried with backoff so one
+    # bad request doesn't end (or, under backfill, restart) the whole race.
+    for attempt in range(retries + 1):
+        try:
+            res = requests.get(url, timeout=3)
+            if res.status_code < 500 or attempt == retries:
+                return res
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+        time.sleep(RETRY_BACKOFF_SECONDS * 2**attempt)
+
+
+def race_folder_path(race_info):
+    return f"{DATA_DIR}/{race_info['season']}/{race_info['city']}/day_{race_info['day_num']}/{race_info['race_folder']}"
+
+
+def covers_race(race_info):
+    # Backfill slices carry the whole race's span; a slice finishing says
+    # nothing about the rest of the race.
+    return race_info["start_ts"] <= race_info.get(
+        "race_start_ts", race_info["start_ts"]
+    ) and race_info["end_ts"] >= race_info.get("race_end_ts", race_info["end_ts"])
+
+
+def run_download(race_info, strict=False, progress=True):
+    path = race_folder_path(race_info)
     os.makedirs(path, exist_ok=True)
+    remove_partial_writes(path)
+    catalog = connect_catalog(DATA_DIR)
+    start_row = update_race(catalog, DATA_DIR, path, "downloading")
 
     current_ts = race_info["start_ts"]
     end_ts = race_info["end_ts"]
     date_path = race_info["date_path"]
 
-    print(f"\n📍 Event: {race_info['event_name']}")
-    print(f"🏙️  City: {race_info['event_city']}")
-    print(f"🗓️  Season: {race_info['season'].replace('_', ' ').title()}")
-    print(f"🏁 Race: {race_info['race_name']}")
-    print(f"📂 Path: {path}")
+    if progress:
+        print(f"\n📍 Event: {race_info['event_name']}")
+        print(f"🏙️  City: {race_info['event_city']}")
+        print(f"🗓️  Season: {race_info['season'].replace('_', ' ').title()}")
+        print(f"🏁 Race: {race_info['race_name']}")
+        print(f"📂 Path: {path}")
 
     downloaded = 0
-    while current_ts <= end_ts:
-        url = f"https://d3q91bfyfm610o.cloudfront.net/{date_path}/{current_ts}/RaceData.json"
-        try:
-            res = requests.get(url, timeout=3)
-            if res.status_code == 200:
-                with open(f"{path}/{current_ts}.json", "w") as f:
-                    f.write(res.text)
-                downloaded += 1
-                print(f"  📥 Packets: {downloaded}", end="\r")
-        except Exception:
-            break
+    bytes_written = 0
+    completed = False
+    dedup = PayloadDeduplicator(path)
+    writer = PacketWriter()
+    try:
+        while current_ts <= end_ts and not STOP_DOWNLOADS.is_set():
+            url = f"{CDN_BASE_URL}/{date_path}/{current_ts}/RaceData.json"
+            try:
+                with phase("network"):
+                    res = fetch_packet(url)
+                if res.status_code == 200:
+                    if dedup.check(current_ts, res.content) is None:
+                        with phase("write"):
+                            writer.write(f"{path}/{current_ts}.json", res.text)
+                        bytes_written += len(res.content)
+                    downloaded += 1
+                    if progress:
+                        print(f"  📥 Packets: {downloaded}", end="\r")
+                    if downloaded % CATALOG_BATCH == 0:
+                        record_progress(
+                            catalog,
+                            DATA_DIR,
+                            path,
+                            start_row["packet_count"] + downloaded,
+                            current_ts,
+                            start_row["byte_size"] + bytes_written,
+                        )
+            except Exception:
+                if strict:
+                    raise
+                break
 
-        current_ts += 500
-        time.sleep(0.02)
+            current_ts += 500
+            time.sleep(0.02)
+        completed = current_ts > end_ts
+    finally:
+        # Drain queued packets before recording references to them.
+        with phase("write"):
+            writer.close()
+        if writer.error:
+            dedup.drop_missing_sources()
+        dedup.save()
+        if not completed or writer.error:
+            status = "interrupted"
+        elif covers_race(race_info):
+            status = "downloaded"
+        else:
+            status = "partial"
+        update_race(catalog, DATA_DIR, path, status)
+        catalog.close()
+
+    if writer.error:
+        raise writer.error
+
+    if not progress:
+        # Parallel downloads share the terminal, so each race reports once.
+        print(
+            f"🏁 {path}: {downloaded} packets, {status}"
+            + (f", {dedup.duplicates} duplicates" if dedup.duplicates else "")
+        )
+    elif dedup.duplicates:
+        print(
+            f"\n  ♻️  Duplicates: {dedup.duplicates} packets stored as references "
+            f"({dedup.bytes_saved / 1024:.1f} KiB not written)"
+        )
 
     return downloaded
 
 
+def build_event_races(season_id, event_id, event_data):
+    event_name = event_data.get("event_name", event_data.get("city", event_id))
+    event_city = event_data.get("city", event_data.get("event_name", event_id))
+
+    races = []
+    for d_idx, day in enumerate(event_data.get("days", []), 1):
+        for race in day.get("races", []):
+            race_start = race.get("start_date_time", race.get("start"))
+            date_path = day.get("date_path") or (
+                day.get("date") or (race_start[:10] if race_start else "")
+            )[:10].replace("-", "")
+            races.append(
+                {
+                    "event_name": event_name,
+                    "event_city": event_city,
+                    "season": season_id,
+                    "race_name": race["name"],
+                    "race_folder": race["name"].lower().replace(" ", "_"),
+                    "city": event_id,
+                    "day_num": d_idx,
+                    "date_path": date_path,
+                    "start_ts": iso_to_unix_ms(race_start),
+                    "end_ts": iso_to_unix_ms(
+                        race.get("end_date_time", race.get("end"))
+                    ),
+                }
+            )
+    return races
+
+
+def download_races(races, workers):
+    total_downloaded = 0
+    if workers <= 1:
+        # Stay on the main thread so profiling.py sees the downloads.
+        try:
+            for race in races:
+                total_downloaded += run_download(race)
+        except KeyboardInterrupt:
+            return total_downloaded, True
+        return total_downloaded, False
+
+    futures = []
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            executor.submit(run_download, race, progress=False) for race in races
+        ]
+        for future in futures:
+            total_downloaded += future.result()
+    except KeyboardInterrupt:
+        STOP_DOWNLOADS.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        total_downloaded = sum(
+            f.result()
+            for f in futures
+            if f.done() and not f.cancelled() and f.exception() is None
+        )
+        return total_downloaded, True
+    executor.shutdown()
+    return total_downloaded, False
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Download race packets from the CDN")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Races downloaded in parallel, scheduled longest first",
+    )
+    args = parser.parse_args()
+
+    with phase("load schedule"):
+        raw_data = load_raw_data()
     seasons_available = {
         str(i + 1): {"id": s, "name": s.replace("_", " ").title()}
-        for i, s in enumerate(RAW_DATA.keys())
+        for i, s in enumerate(raw_data.keys())
     }
 
     selected_seasons = select_from_list(seasons_available, "SELECT SEASON(S)")
@@ -111,7 +285,7 @@ def main():
     event_idx = 1
     for season in selected_seasons:
         season_id = season["id"]
-        season_data = RAW_DATA.get(season_id, {})
+        season_data = raw_data.get(season_id, {})
         events = season_data.get("events", {})
         for event_id, event_data in events.items():
             race_count = sum(
@@ -141,43 +315,28 @@ def main():
 
     races_to_download = []
     for event in selected_events:
-        season_id = event["season"]
-        event_id = event["id"]
-        event_data = event["event_data"]
-        event_name = event_data.get("event_name", event_data.get("city", event_id))
-        event_city = event_data.get("city", event_data.get("event_name", event_id))
-
-        for d_idx, day in enumerate(event_data.get("days", []), 1):
-            for race in day.get("races", []):
-                race_start = race.get("start_date_time", race.get("start"))
-                date_path = day.get("date_path") or (
-                    day.get("date") or (race_start[:10] if race_start else "")
-                )[:10].replace("-", "")
-                races_to_download.append(
-                    {
-                        "event_name": event_name,
-                        "event_city": event_city,
-                        "season": season_id,
-                        "race_name": race["name"],
-                        "race_folder": race["name"].lower().replace(" ", "_"),
-                        "city": event_id,
-                        "day_num": d_idx,
-                        "date_path": date_path,
-                        "start_ts": iso_to_unix_ms(race_start),
-                        "end_ts": iso_to_unix_ms(
-                            race.get("end_date_time", race.get("end"))
-                        ),
-                    }
-                )
+        races_to_download.extend(
+            build_event_races(event["season"], event["id"], event["event_data"])
+        )
 
     if races_to_download:
         print(
             f"\n📦 Queueing {len(races_to_download)} races from {len(selected_events)} event(s)..."
         )
-        total_downloaded = 0
-        for race in races_to_download:
-            downloaded = run_download(race)
-            total_downloaded += downloaded
+        with phase("plan"):
+            plan = plan_downloads(races_to_download, args.workers, DATA_DIR)
+        print_plan(plan)
+        races_to_download = [estimate["race"] for estimate in plan["order"]]
+
+        total_downloaded, interrupted = download_races(
+            races_to_download, args.workers
+        )
+        if interrupted:
+            print(
+                f"\n\n🛑 Interrupted, pending packets flushed. "
+                f"Total packets: {total_downloaded}"
+            )
+            return
         print(f"\n\n✨ All downloads complete. Total packets: {total_downloaded}")
 
 
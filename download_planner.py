@@ -0,0 +1,135 @@
+import argparse
+import heapq
+import os
+
+from catalog import list_races
+
+PACKET_INTERVAL_MS = 500
+DEFAULT_BYTES_PER_PACKET = 8 * 1024
+DEFAULT_SECONDS_PER_PACKET = 0.05
+
+
+def estimate_packets(race_info):
+    span = race_info["end_ts"] - race_info["start_ts"]
+    if span < 0:
+        return 0
+    return span // PACKET_INTERVAL_MS + 1
+
+
+def bytes_per_packet_history(data_dir):
+    # Average stored bytes per packet, per venue and overall, from races
+    # already in the catalog.
+    totals = {}
+    for row in list_races(data_dir):
+        if not row["packet_count"] or not row["byte_size"]:
+            continue
+        for key in (row["event"], None):
+            packets, size = totals.get(key, (0, 0))
+            totals[key] = (packets + row["packet_count"], size + row["byte_size"])
+    return {key: size / packets for key, (packets, size) in totals.items()}
+
+
+def estimate_race(race_info, history, seconds_per_packet):
+    packets = estimate_packets(race_info)
+    per_packet = history.get(
+        race_info["city"], history.get(None, DEFAULT_BYTES_PER_PACKET)
+    )
+    return {
+        "race": race_info,
+        "packets": packets,
+        "bytes": int(packets * per_packet),
+        "seconds": packets * seconds_per_packet,
+    }
+
+
+def plan_schedule(estimates, workers):
+    """Assign races to workers longest-first onto the least loaded worker."""
+    ordered = sorted(estimates, key=lambda e: e["seconds"], reverse=True)
+    loads = [(0.0, worker) for worker in range(max(workers, 1))]
+    assignments = [[] for _ in loads]
+    for estimate in ordered:
+        load, worker = heapq.heappop(loads)
+        assignments[worker].append(estimate)
+        heapq.heappush(loads, (load + estimate["seconds"], worker))
+
+    total_seconds = sum(e["seconds"] for e in estimates)
+    longest = ordered[0]["seconds"] if ordered else 0.0
+    return {
+        "order": ordered,
+        "assignments": assignments,
+        "eta_seconds": max(load for load, _ in loads),
+        "ideal_seconds": max(total_seconds / len(assignments), longest),
+        "total_seconds": total_seconds,
+        "packets": sum(e["packets"] for e in estimates),
+        "bytes": sum(e["bytes"] for e in estimates),
+    }
+
+
+def plan_downloads(races, workers, data_dir="data", seconds_per_packet=None):
+    history = bytes_per_packet_history(data_dir) if os.path.isdir(data_dir) else {}
+    estimates = [
+        estimate_race(
+            race_info, history, seconds_per_packet or DEFAULT_SECONDS_PER_PACKET
+        )
+        for race_info in races
+    ]
+    return plan_schedule(estimates, workers)
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s"
+
+
+def print_plan(plan, verbose=False):
+    workers = len(plan["assignments"])
+    print(
+        f"\n🧮 Plan: {len(plan['order'])} races, ~{plan['packets']} packets, "
+        f"~{plan['bytes'] / 1024 / 1024:.1f} MiB"
+    )
+    print(
+        f"⏱️  ETA with {workers} worker(s): {format_duration(plan['eta_seconds'])} "
+        f"(ideal {format_duration(plan['ideal_seconds'])}, "
+        f"serial {format_duration(plan['total_seconds'])})"
+    )
+    if verbose:
+        for worker, estimates in enumerate(plan["assignments"], 1):
+            load = sum(e["seconds"] for e in estimates)
+            print(f"  worker {worker}: {len(estimates)} races, {format_duration(load)}")
+            for e in estimates:
+                race = e["race"]
+                print(
+                    f"    {race['season']}/{race['city']}/{race['race_folder']}: "
+                    f"{e['packets']} packets, {format_duration(e['seconds'])}"
+                )
+
+
+def main():
+    from download_events import build_event_races, load_raw_data
+
+    parser = argparse.ArgumentParser(
+        description="Estimate download cost per race and plan a worker schedule"
+    )
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--season", action="append", dest="seasons")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--seconds-per-packet", type=float, default=DEFAULT_SECONDS_PER_PACKET
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    races = []
+    for season_id, season_data in load_raw_data().items():
+        if args.seasons and season_id not in args.seasons:
+            continue
+        for event_id, event_data in season_data.get("events", {}).items():
+            races.extend(build_event_races(season_id, event_id, event_data))
+
+    plan = plan_downloads(races, args.workers, args.data_dir, args.seconds_per_packet)
+    print_plan(plan, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
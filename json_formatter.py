@@ -7,6 +7,8 @@ Reads a JSON file and outputs it with proper formatting
 import json
 import sys
 
+import codec
+
 
 def format_json(input_file, output_file=None, indent=2):
     """
@@ -19,11 +21,11 @@ def format_json(input_file, output_file=None, indent=2):
     """
     try:
         # Read the JSON file
-        with open(input_file, 'r') as f:
-            data = json.load(f)
+        with open(input_file, 'rb') as f:
+            data = codec.load(f)
         
         # Format the JSON
-        formatted_json = json.dumps(data, indent=indent, sort_keys=True)
+        formatted_json = codec.dumps(data, indent=indent, sort_keys=True)
         
         # Write to output file or overwrite input
         output_path = output_file if output_file else input_file
@@ -1,12 +1,17 @@
-import json
 import os
 from pathlib import Path
 from datetime import datetime, timezone
 
+import codec
+from catalog import list_races
+from packets import read_artefact
+from profiling import phase
+from transitions import NO_DATA_STATUS, load_transitions
+
 
 def load_races_data():
-    with open("races-data.json", "r") as f:
-        return json.load(f)
+    with open("races-data.json", "rb") as f:
+        return codec.load(f)
 
 
 def normalize_race_name(name):
@@ -44,31 +49,23 @@ def get_all_expected_races(races_data):
 
 def get_all_downloaded_races(data_dir):
     downloaded_races = []
-    for season_folder in sorted(os.listdir(data_dir)):
-        season_path = os.path.join(data_dir, season_folder)
-        if not os.path.isdir(season_path):
-            continue
-        for event_folder in sorted(os.listdir(season_path)):
-            event_path = os.path.join(season_path, event_folder)
-            if not os.path.isdir(event_path):
-                continue
-            for day_folder in sorted(os.listdir(event_path)):
-                day_path = os.path.join(event_path, day_folder)
-                if not os.path.isdir(day_path):
-                    continue
-                for race_folder in sorted(os.listdir(day_path)):
-                    race_path = os.path.join(day_path, race_folder)
-                    if not os.path.isdir(race_path):
-                        continue
-                    downloaded_races.append(
-                        {
-                            "season": season_folder,
-                            "event": event_folder,
-                            "race_folder": race_folder,
-                            "race_folder_normalized": normalize_race_name(race_folder),
-                            "full_path": race_path,
-                        }
-                    )
+    for row in list_races(data_dir):
+        downloaded_races.append(
+            {
+                "season": row["season"],
+                "event": row["event"],
+                "race_folder": row["race_folder"],
+                "race_folder_normalized": normalize_race_name(row["race_folder"]),
+                "full_path": row["path"],
+                "packet_count": row["packet_count"],
+                "first_file": row["first_file"],
+                "first_ts": row["first_ts"],
+                "last_file": row["last_file"],
+                "last_ts": row["last_ts"],
+                "byte_size": row["byte_size"],
+                "status": row["status"],
+            }
+        )
     return downloaded_races
 
 
@@ -82,24 +79,10 @@ def parse_datetime_to_timestamp(start_date_time):
         return None
 
 
-def get_first_file_info(race_path):
-    files = sorted([f for f in os.listdir(race_path) if f.endswith(".json")])
-    if not files:
-        return None, None, None, None
-    first_file = files[0]
-    last_file = files[-1]
-    try:
-        first_timestamp = int(first_file.replace(".json", ""))
-        last_timestamp = int(last_file.replace(".json", ""))
-        return first_file, first_timestamp, last_file, last_timestamp
-    except ValueError:
-        return first_file, None, last_file, None
-
-
 def check_boat_status_in_file(file_path):
     try:
-        with open(file_path, "r") as f:
-            data = json.load(f)
+        with phase("parse packets"), open(file_path, "rb") as f:
+            data = codec.load(f)
         if isinstance(data, list) and len(data) > 0:
             race_status = data[0].get("raceStatus", {})
             boat_statuses = data[0].get("boatStatuses", [])
@@ -108,15 +91,17 @@ def check_boat_status_in_file(file_path):
             return race_status.get("status", "Unknown")
     except Exception as e:
         return f"Error: {e}"
-    return "No data"
+    return NO_DATA_STATUS
 
 
 def main():
     data_dir = "data"
-    races_data = load_races_data()
+    with phase("load schedule"):
+        races_data = load_races_data()
 
     expected_races = get_all_expected_races(races_data)
-    downloaded_races = get_all_downloaded_races(data_dir)
+    with phase("list folders"):
+        downloaded_races = get_all_downloaded_races(data_dir)
 
     print("=" * 80)
     print("SAILGP DATA SCRAPER - FEEDBACK REPORT")
@@ -261,9 +246,8 @@ def main():
 
         start_time_str = expected_race_info["start_date_time"]
         expected_timestamp = parse_datetime_to_timestamp(start_time_str)
-        first_file_name, file_timestamp, last_file_name, last_file_timestamp = (
-            get_first_file_info(race_path)
-        )
+        first_file_name, file_timestamp = race["first_file"], race["first_ts"]
+        last_file_name = race["last_file"]
 
         if not first_file_name:
             incomplete_races.append(
@@ -279,8 +263,16 @@ def main():
             )
             continue
 
-        first_file_path = os.path.join(race_path, first_file_name)
-        first_boat_status = check_boat_status_in_file(first_file_path)
+        with phase("read transition logs"):
+            transitions_log = load_transitions(
+                race_path,
+                {"packet_count": race["packet_count"], "last_ts": race["last_ts"]},
+            )
+        if transitions_log:
+            first_boat_status = transitions_log["first_status"]
+        else:
+            first_file_path = os.path.join(race_path, first_file_name)
+            first_boat_status = check_boat_status_in_file(first_file_path)
 
         if not last_file_name:
             incomplete_races.append(
@@ -296,12 +288,19 @@ def main():
             )
             continue
 
-        last_file_path = os.path.join(race_path, last_file_name)
-        last_boat_status = check_boat_status_in_file(last_file_path)
+        if transitions_log:
+            last_boat_status = transitions_log["last_status"]
+        else:
+            last_file_path = os.path.join(race_path, last_file_name)
+            last_boat_status = check_boat_status_in_file(last_file_path)
 
         checks_passed = True
         issues = []
 
+        compaction = read_artefact(race_path, "compaction")
+        if compaction:
+            file_timestamp = compaction["original_first_ts"]
+
         if expected_timestamp and file_timestamp:
             if abs(expected_timestamp - file_timestamp) > 1000:
                 issues.append(
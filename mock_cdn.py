@@ -0,0 +1,72 @@
+import argparse
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STALL_EVERY = 20
+
+
+def make_packet(ts):
+    # Every other block of packets repeats one payload, like a stalled feed.
+    step = ts // 500
+    tick = step - step % STALL_EVERY if (step // STALL_EVERY) % 2 else step
+    boats = [
+        {
+            "boatId": boat_id,
+            "boatStatus": "Racing",
+            "leg": 1 + (tick // 40 + boat_id) % 6,
+            "lat": -33.85 + (tick % 100) * 1e-4,
+            "lon": 151.2 + boat_id * 1e-3,
+        }
+        for boat_id in range(1, 4)
+    ]
+    return [{"raceStatus": {"status": "Racing"}, "boatStatuses": boats}]
+
+
+class MockCDNHandler(BaseHTTPRequestHandler):
+    fail_rate = 0.0
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 3 or parts[2] != "RaceData.json" or not parts[1].isdigit():
+            self.send_error(404)
+            return
+        if random.random() < self.fail_rate:
+            self.close_connection = True
+            return
+
+        body = json.dumps(make_packet(int(parts[1]))).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the RaceData CDN, for backfill testing"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests dropped without a response",
+    )
+    args = parser.parse_args()
+
+    MockCDNHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), MockCDNHandler)
+    print(f"Mock CDN on http://127.0.0.1:{args.port} (SAILGP_CDN_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
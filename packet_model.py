@@ -0,0 +1,194 @@
+import argparse
+import os
+import tracemalloc
+
+import codec
+from packets import (
+    BOAT_ID_KEYS,
+    LAT_KEYS,
+    LEG_KEYS,
+    LON_KEYS,
+    POSITION_KEYS,
+    get_boat_records,
+    get_field,
+    list_packet_entries,
+)
+
+NUMBER = (int, float)
+BOAT_FIELD_TYPES = {
+    BOAT_ID_KEYS: (int, str),
+    LEG_KEYS: NUMBER,
+    POSITION_KEYS: NUMBER,
+    LAT_KEYS: NUMBER,
+    LON_KEYS: NUMBER,
+}
+
+
+class PacketSchemaError(ValueError):
+    pass
+
+
+class BoatState:
+    __slots__ = ("boat_id", "status", "leg", "position", "lat", "lon")
+
+    def __init__(self, boat_id, status, leg, position, lat, lon):
+        self.boat_id = boat_id
+        self.status = status
+        self.leg = leg
+        self.position = position
+        self.lat = lat
+        self.lon = lon
+
+    def __repr__(self):
+        return f"BoatState({self.boat_id!r}, {self.status!r}, leg={self.leg})"
+
+
+class Packet:
+    __slots__ = ("ts", "race_status", "boats")
+
+    def __init__(self, ts, race_status, boats):
+        self.ts = ts
+        self.race_status = race_status
+        self.boats = boats
+
+    @property
+    def lead_status(self):
+        if self.boats:
+            return self.boats[0].status
+        return self.race_status
+
+    def __repr__(self):
+        return f"Packet({self.ts!r}, {self.race_status!r}, {len(self.boats)} boats)"
+
+
+def validate_packet(data):
+    problems = []
+    if isinstance(data, list):
+        if not data:
+            return ["empty packet list"]
+        data = data[0]
+    if not isinstance(data, dict):
+        return [f"packet is {type(data).__name__}, expected object"]
+
+    race_status = data.get("raceStatus")
+    if not isinstance(race_status, dict):
+        problems.append("raceStatus missing or not an object")
+    elif not isinstance(race_status.get("status"), str):
+        problems.append("raceStatus.status missing or not a string")
+
+    # Same precedence as packets.get_boat_records: an empty "boats" list
+    # falls through to "boatStatuses".
+    boats = data.get("boats") or data.get("boatStatuses")
+    if boats is None:
+        boats = data.get("boats")
+    if boats is None:
+        problems.append("boatStatuses missing")
+        return problems
+    if not isinstance(boats, list):
+        return problems + ["boatStatuses is not a list"]
+
+    for index, boat in enumerate(boats):
+        if not isinstance(boat, dict):
+            problems.append(f"boat {index} is not an object")
+            continue
+        status = boat.get("boatStatus")
+        if status is not None and not isinstance(status, str):
+            problems.append(f"boat {index}: boatStatus is not a string")
+        for keys, types in BOAT_FIELD_TYPES.items():
+            value = get_field(boat, keys)
+            if value is not None and (
+                not isinstance(value, types) or isinstance(value, bool)
+            ):
+                problems.append(
+                    f"boat {index}: {keys[0]} is {type(value).__name__}"
+                )
+    return problems
+
+
+def build_packet(data, ts=None):
+    if isinstance(data, list):
+        data = data[0]
+    boats = tuple(
+        BoatState(
+            get_field(boat, BOAT_ID_KEYS),
+            boat.get("boatStatus", "Unknown"),
+            get_field(boat, LEG_KEYS),
+            get_field(boat, POSITION_KEYS),
+            get_field(boat, LAT_KEYS),
+            get_field(boat, LON_KEYS),
+        )
+        for boat in get_boat_records(data)
+    )
+    return Packet(ts, data.get("raceStatus", {}).get("status", "Unknown"), boats)
+
+
+def decode_packet(raw, ts=None, validate=True):
+    data = codec.loads(raw)
+    if validate:
+        problems = validate_packet(data)
+        if problems:
+            raise PacketSchemaError("; ".join(problems))
+    return build_packet(data, ts)
+
+
+def read_race_payloads(race_path):
+    payloads = []
+    for ts, file_name in list_packet_entries(race_path):
+        with open(os.path.join(race_path, file_name), "rb") as f:
+            payloads.append((ts, f.read()))
+    return payloads
+
+
+def measure_memory(payloads, decode):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    decoded = [decode(raw, ts) for ts, raw in payloads]
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del decoded
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate a race's packets and compare decoded memory use"
+    )
+    parser.add_argument("race_path")
+    args = parser.parse_args()
+
+    payloads = read_race_payloads(args.race_path)
+    if not payloads:
+        print(f"No packets in {args.race_path}")
+        return
+
+    invalid = 0
+    valid = []
+    for ts, raw in payloads:
+        try:
+            decode_packet(raw, ts)
+        except ValueError as e:
+            invalid += 1
+            if invalid <= 10:
+                print(f"  {ts}: {e}")
+            continue
+        valid.append((ts, raw))
+    print(f"Schema check: {len(valid)}/{len(payloads)} packets valid")
+
+    # Invalid packets may not decode at all, so only valid ones are measured.
+    payloads = valid
+    if not payloads:
+        return
+
+    dict_bytes = measure_memory(payloads, lambda raw, ts: codec.loads(raw))
+    model_bytes = measure_memory(
+        payloads, lambda raw, ts: decode_packet(raw, ts, validate=False)
+    )
+    count = len(payloads)
+    print(f"Raw dicts:    {dict_bytes / count:>8.0f} bytes/packet")
+    print(f"Packet model: {model_bytes / count:>8.0f} bytes/packet")
+    if model_bytes:
+        print(f"Reduction:    {dict_bytes / model_bytes:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import os
+import queue
+import re
+import socket
+import threading
+import time
+import uuid
+
+TMP_SUFFIX = ".tmp"
+STALE_TMP_SECONDS = 3600
+# <file>.<host>-<pid>-<nonce>.tmp, so each writer only ever touches its own
+# temporary files.
+TMP_NAME = re.compile(r"\.(?P<host>[^.]+)-(?P<pid>\d+)-[0-9a-f]{8}\.tmp$")
+_STOP = object()
+
+
+def host_token():
+    return socket.gethostname().replace(".", "_")
+
+
+def writer_suffix():
+    return f".{host_token()}-{os.getpid()}-{uuid.uuid4().hex[:8]}{TMP_SUFFIX}"
+
+
+def write_atomic(path, content, fsync=False, suffix=TMP_SUFFIX):
+    tmp_path = path + suffix
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(tmp_path, mode) as f:
+        f.write(content)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def is_stale_tmp(path, name, host, now):
+    match = TMP_NAME.search(name)
+    if match and match.group("host") == host:
+        return not process_alive(int(match.group("pid")))
+    # Writers on other hosts (or older unnamed temporaries) can't be checked,
+    # so only leftovers that have not been touched for a long time go.
+    return now - os.path.getmtime(path) > STALE_TMP_SECONDS
+
+
+def remove_partial_writes(folder):
+    removed = 0
+    host = host_token()
+    now = time.time()
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if not name.endswith(TMP_SUFFIX):
+            continue
+        try:
+            if is_stale_tmp(path, name, host, now):
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            # The owning writer renamed or removed it in the meantime.
+            continue
+    return removed
+
+
+class PacketWriter:
+    """Writes packets on a background thread behind a bounded queue.
+
+    ``write`` blocks once ``max_pending`` packets are waiting, so a slow disk
+    throttles the fetch loop instead of growing memory without bound.
+    ``close`` drains the queue; check ``error`` afterwards.
+    """
+
+    def __init__(self, max_pending=256, batch_size=32, fsync=False):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.suffix = writer_suffix()
+        self.written = 0
+        self.bytes_written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, path, content):
+        if self.error:
+            raise self.error
+        self.queue.put((path, content))
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                elif not self.error:
+                    path, content = item
+                    try:
+                        write_atomic(path, content, self.fsync, self.suffix)
+                        self.written += 1
+                        self.bytes_written += len(content)
+                    except Exception as e:
+                        self.error = e
+                self.queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        self.queue.join()
+        if self.error:
+            raise self.error
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
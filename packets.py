@@ -0,0 +1,92 @@
+import os
+
+import codec
+
+BOAT_ID_KEYS = ("boatId", "boat_id", "id")
+LEG_KEYS = ("leg", "legNumber", "currentLeg")
+POSITION_KEYS = ("position", "rank")
+LAT_KEYS = ("lat", "latitude")
+LON_KEYS = ("lon", "lng", "longitude")
+FINISHED_STATUSES = ("Finished", "Terminated")
+
+
+def get_field(record, keys, default=None):
+    for key in keys:
+        value = record.get(key)
+        if value is not None:
+            return value
+    return default
+
+
+def list_packet_files(race_path):
+    files = []
+    for name in os.listdir(race_path):
+        stem, ext = os.path.splitext(name)
+        if ext == ".json" and stem.isdigit():
+            files.append(name)
+    return sorted(files, key=lambda name: int(name[:-5]))
+
+
+def packet_timestamp(file_name):
+    return int(os.path.splitext(os.path.basename(file_name))[0])
+
+
+def list_packet_entries(race_path):
+    entries = {packet_timestamp(name): name for name in list_packet_files(race_path)}
+    manifest = read_artefact(race_path, "dedup")
+    if manifest:
+        for ts, source_ts in manifest.get("refs", {}).items():
+            entries.setdefault(int(ts), f"{source_ts}.json")
+    return sorted(entries.items())
+
+
+def source_signature(race_path, entries=None):
+    if entries is None:
+        entries = list_packet_entries(race_path)
+    return {
+        "packet_count": len(entries),
+        "last_ts": entries[-1][0] if entries else None,
+    }
+
+
+def artefact_path(race_path, kind):
+    race_path = race_path.rstrip(os.sep)
+    return f"{race_path}.{kind}.json"
+
+
+def get_race_status(packet):
+    return packet.get("raceStatus", {}).get("status", "Unknown")
+
+
+def get_lead_status(packet):
+    boat_statuses = packet.get("boatStatuses", [])
+    if boat_statuses:
+        return boat_statuses[0].get("boatStatus", "Unknown")
+    return get_race_status(packet)
+
+
+def get_boat_records(packet):
+    boats = packet.get("boats") or packet.get("boatStatuses") or []
+    return [boat for boat in boats if isinstance(boat, dict)]
+
+
+def get_boat_id(boat, index=None):
+    boat_id = get_field(boat, BOAT_ID_KEYS)
+    if boat_id is None:
+        return str(index) if index is not None else None
+    return str(boat_id)
+
+
+def write_artefact(race_path, kind, data, indent=2):
+    path = artefact_path(race_path, kind)
+    with open(path, "w") as f:
+        codec.dump(data, f, indent=indent)
+    return path
+
+
+def read_artefact(race_path, kind):
+    path = artefact_path(race_path, kind)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return codec.load(f)
@@ -1,8 +1,66 @@
 import json
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import codec
+from profiling import phase
+
+SEASONS = range(1, 7)
+READ_CHUNK_SIZE = 1 << 16
+
+
+def iter_json_array(file_path, chunk_size=READ_CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    with open(file_path, "r") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+        started = False
+
+        def read_more(size):
+            nonlocal buffer, pos, eof
+            chunk = f.read(size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError(f"{file_path}: unexpected end of JSON array")
+                read_more(chunk_size)
+                continue
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"{file_path}: expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+            if end is None or (end >= len(buffer) and not eof):
+                if eof:
+                    raise ValueError(f"{file_path}: truncated JSON array entry")
+                # Grow reads with the pending entry so large entries are not
+                # re-parsed once per chunk.
+                read_more(max(chunk_size, len(buffer) - pos))
+                continue
+            yield item
+            pos = end
+
 
 def slugify(text):
     if not text:
@@ -103,12 +161,9 @@ def clean_race_days_data(days):
 
 
 def extract_comprehensive_data(file_path, season_num):
-    with open(file_path, "r") as f:
-        data = json.load(f)
-
     events_dict = {}
 
-    for idx, entry in enumerate(data):
+    for idx, entry in enumerate(iter_json_array(file_path)):
         leaderboard = entry.get("appLeaderboard", {})
 
         short_name_subtitle = entry.get("shortNameSubtitle", "")
@@ -305,28 +360,56 @@ def extract_comprehensive_data(file_path, season_num):
     return events_dict
 
 
-final_dict = {}
-for i in range(1, 7):
-    path = f"races-info/season_{i}.json"
-    if os.path.exists(path):
-        final_dict[f"season{i}"] = {
-            "season_number": i,
-            "events": extract_comprehensive_data(path, i),
-        }
+def build_season(season_num):
+    path = f"races-info/season_{season_num}.json"
+    if not os.path.exists(path):
+        return None
+    return {
+        "season_number": season_num,
+        "events": extract_comprehensive_data(path, season_num),
+    }
+
+
+def build_races_data(seasons=SEASONS, workers=None):
+    seasons = list(seasons)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(build_season, seasons))
+
+    final_dict = {}
+    for season_num, season_data in zip(seasons, results):
+        if season_data is not None:
+            final_dict[f"season{season_num}"] = season_data
+    return final_dict
+
+
+def write_races_data(final_dict, output_path="races-data.json"):
+    with open(output_path, "w") as f:
+        codec.dump(final_dict, f, indent=2)
+
+
+def print_summary(final_dict):
+    print(f"Created races-data.json with {len(final_dict)} seasons")
+
+    for season_key, season_data in final_dict.items():
+        num_events = len(season_data.get("events", {}))
+        total_teams = sum(
+            len(e.get("teams", {})) for e in season_data.get("events", {}).values()
+        )
+        total_crew = sum(
+            e.get("num_crew", 0) for e in season_data.get("events", {}).values()
+        )
+        print(
+            f"{season_key}: {num_events} events, {total_teams} teams, {total_crew} crew members"
+        )
+
+
+def main():
+    with phase("parse season files"):
+        final_dict = build_races_data()
+    with phase("write"):
+        write_races_data(final_dict)
+    print_summary(final_dict)
+
 
-with open("races-data.json", "w") as f:
-    json.dump(final_dict, f, indent=2)
-
-print(f"Created races-data.json with {len(final_dict)} seasons")
-
-for season_key, season_data in final_dict.items():
-    num_events = len(season_data.get("events", {}))
-    total_teams = sum(
-        len(e.get("teams", {})) for e in season_data.get("events", {}).values()
-    )
-    total_crew = sum(
-        e.get("num_crew", 0) for e in season_data.get("events", {}).values()
-    )
-    print(
-        f"{season_key}: {num_events} events, {total_teams} teams, {total_crew} crew members"
-    )
+if __name__ == "__main__":
+    main()
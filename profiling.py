@@ -0,0 +1,211 @@
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import runpy
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+PHASES = {}
+PHASES_LOCK = threading.Lock()
+DEFAULT_REPORT = "profile-report.txt"
+
+
+@contextmanager
+def phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with PHASES_LOCK:
+            total, calls = PHASES.get(name, (0.0, 0))
+            PHASES[name] = (total + elapsed, calls + 1)
+
+
+class StackSampler:
+    def __init__(self, interval=0.005, depth=3):
+        self.interval = interval
+        self.depth = depth
+        self.samples = Counter()
+        self.total = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        # Every thread is sampled, so work handed to pools shows up as well.
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.depth:
+                    code = frame.f_code
+                    stack.append(
+                        f"{os.path.basename(code.co_filename)}:{frame.f_lineno} "
+                        f"{code.co_name}"
+                    )
+                    frame = frame.f_back
+                if stack:
+                    self.samples[" <- ".join(stack)] += 1
+                    self.total += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def format_phases(phases, wall_time):
+    lines = [f"{'phase':<28} {'seconds':>10} {'calls':>10} {'% wall':>8}"]
+    for name, (total, calls) in sorted(
+        phases.items(), key=lambda item: item[1][0], reverse=True
+    ):
+        share = total / wall_time * 100 if wall_time else 0
+        lines.append(f"{name:<28} {total:>10.3f} {calls:>10} {share:>7.1f}%")
+    return lines
+
+
+def format_allocations(snapshot, limit):
+    lines = []
+    for stat in snapshot.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"{stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  "
+            f"{frame.filename}:{frame.lineno}"
+        )
+    return lines
+
+
+class ThreadProfilers:
+    """Gives each thread started while profiling its own cProfile.Profile.
+
+    Before Python 3.12 a profiler only sees the thread that enabled it.
+    """
+
+    def __init__(self):
+        self.profilers = []
+        self.lock = threading.Lock()
+
+    def _start(self, frame, event, arg):
+        profiler = cProfile.Profile()
+        with self.lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+    def install(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._start)
+
+    def uninstall(self):
+        threading.setprofile(None)
+
+
+def run_profiled(script, script_args, mode, trace_memory, report_path, limit):
+    # The script imports this module by name, which is a different module
+    # object from __main__ when profiling.py is run directly.
+    import profiling
+
+    sys.argv = [script] + script_args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+
+    profiler = cProfile.Profile() if mode == "cprofile" else None
+    thread_profilers = ThreadProfilers() if profiler else None
+    sampler = StackSampler() if mode == "sample" else None
+    if trace_memory:
+        tracemalloc.start(10)
+
+    started = time.perf_counter()
+    if profiler:
+        thread_profilers.install()
+        profiler.enable()
+    if sampler:
+        sampler.start()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit:
+        pass
+    finally:
+        wall_time = time.perf_counter() - started
+        if profiler:
+            profiler.disable()
+            thread_profilers.uninstall()
+        if sampler:
+            sampler.stop()
+        snapshot = tracemalloc.take_snapshot() if trace_memory else None
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+        lines = [f"Profile of {script} {' '.join(script_args)}".rstrip()]
+        lines.append(f"Wall time: {wall_time:.3f} s")
+        lines += ["", "== Phases =="] + format_phases(profiling.PHASES, wall_time)
+
+        if profiler:
+            stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            for thread_profiler in thread_profilers.profilers:
+                stats.add(thread_profiler)
+            stats.sort_stats("cumulative").print_stats(limit)
+            threads = len(thread_profilers.profilers)
+            lines += ["", f"== cProfile (cumulative, {threads} extra threads) =="]
+            lines.append(stream.getvalue())
+
+        if sampler:
+            lines += ["", f"== Sampled stacks ({sampler.total} samples) =="]
+            for stack, count in sampler.samples.most_common(limit):
+                share = count / sampler.total * 100 if sampler.total else 0
+                lines.append(f"{share:>6.1f}%  {stack}")
+
+        if snapshot:
+            lines += ["", f"== Top allocations (peak {peak / 1024 / 1024:.1f} MiB) =="]
+            lines += format_allocations(snapshot, limit)
+
+        with open(report_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"\n📊 Profile report written to {report_path}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run an entry point under a profiler and write a report",
+        usage="python profiling.py [options] script.py [script args...]",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("cprofile", "sample", "none"),
+        default="cprofile",
+        help="cProfile (exact, slower) or a stack sampler (low overhead)",
+    )
+    parser.add_argument(
+        "--no-tracemalloc",
+        dest="trace_memory",
+        action="store_false",
+        help="Skip allocation tracking",
+    )
+    parser.add_argument("--report", default=DEFAULT_REPORT)
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("script")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    run_profiled(
+        args.script,
+        args.script_args,
+        None if args.mode == "none" else args.mode,
+        args.trace_memory,
+        args.report,
+        args.limit,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import math
+import os
+import sqlite3
+import time
+
+import codec
+from archive_reader import get_reader
+from main import get_all_downloaded_races
+from packets import (
+    LAT_KEYS,
+    LON_KEYS,
+    get_boat_id,
+    get_boat_records,
+    get_field,
+    list_packet_entries,
+    read_artefact,
+    source_signature,
+    write_artefact,
+)
+
+CELL_SIZE_DEG = 0.001
+EARTH_RADIUS_M = 6371000
+VENUE_INDEX_DIR = os.path.join("indexes", "venues")
+
+
+def cell_key(lat, lon, cell_size=CELL_SIZE_DEG):
+    return f"{math.floor(lat / cell_size)},{math.floor(lon / cell_size)}"
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def race_id(race):
+    day_folder = os.path.basename(os.path.dirname(race["full_path"]))
+    return f"{race['season']}/{race['event']}/{day_folder}/{race['race_folder']}"
+
+
+def build_race_index(race_path):
+    entries = list_packet_entries(race_path)
+    source = source_signature(race_path, entries)
+
+    index = read_artefact(race_path, "spatial")
+    if index and index.get("source") == source:
+        return index, False
+
+    # Packets are normally appended, so a stale index is extended from its
+    # last timestamp unless files were added or removed before that point.
+    appendable = (
+        index
+        and index.get("cell_size") == CELL_SIZE_DEG
+        and index["source"]["last_ts"] is not None
+        and source["packet_count"] - index["source"]["packet_count"]
+        == sum(1 for ts, _ in entries if ts > index["source"]["last_ts"])
+    )
+    if not appendable:
+        index = {"cell_size": CELL_SIZE_DEG, "cells": {}}
+        after_ts = None
+    else:
+        after_ts = index["source"]["last_ts"]
+
+    cells = index["cells"]
+    for ts, packet in get_reader().iter_packets(race_path, after_ts=after_ts):
+        for boat_index, boat in enumerate(get_boat_records(packet)):
+            lat = get_field(boat, LAT_KEYS)
+            lon = get_field(boat, LON_KEYS)
+            if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+                continue
+            cells.setdefault(cell_key(lat, lon), []).append(
+                [ts, get_boat_id(boat, boat_index), lat, lon]
+            )
+
+    index["source"] = source
+    write_artefact(race_path, "spatial", index, indent=None)
+    return index, True
+
+
+def venue_index_path(data_dir, venue):
+    return os.path.join(data_dir, VENUE_INDEX_DIR, f"{venue}.spatial.sqlite")
+
+
+def connect_venue_index(data_dir, venue, create=False):
+    path = venue_index_path(data_dir, venue)
+    if not create and not os.path.exists(path):
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS races (race TEXT PRIMARY KEY, source TEXT);
+        CREATE TABLE IF NOT EXISTS points (
+            race TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            boat,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            ci INTEGER NOT NULL,
+            cj INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS points_cell ON points (ci, cj, ts);
+        CREATE INDEX IF NOT EXISTS points_race ON points (race);
+        """
+    )
+    return conn
+
+
+def refresh_venue_index(data_dir, venue, races):
+    # Points live in SQLite keyed by grid cell, so queries read only the cells
+    # they cover. Each race's stored source signature is checked first, so
+    # only races that changed have their per-race index loaded and rewritten.
+    conn = connect_venue_index(data_dir, venue, create=True)
+    stored = dict(conn.execute("SELECT race, source FROM races"))
+    races = {race_id(race): race["full_path"] for race in races}
+    changed = 0
+    with conn:
+        for rid in set(stored) - set(races):
+            conn.execute("DELETE FROM points WHERE race = ?", (rid,))
+            conn.execute("DELETE FROM races WHERE race = ?", (rid,))
+        for rid, race_path in sorted(races.items()):
+            source = codec.dumps(source_signature(race_path), sort_keys=True)
+            if stored.get(rid) == source:
+                continue
+            index, _ = build_race_index(race_path)
+            changed += 1
+            conn.execute("DELETE FROM points WHERE race = ?", (rid,))
+            conn.executemany(
+                "INSERT INTO points VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (rid, ts, boat_id, lat, lon, *map(int, key.split(",")))
+                    for key, points in index["cells"].items()
+                    for ts, boat_id, lat, lon in points
+                ),
+            )
+            source = codec.dumps(index["source"], sort_keys=True)
+            conn.execute("INSERT OR REPLACE INTO races VALUES (?, ?)", (rid, source))
+    conn.close()
+    return changed
+
+
+def build_indexes(data_dir, season=None, venues=None):
+    all_races = get_all_downloaded_races(data_dir)
+    selected_venues = {
+        race["event"]
+        for race in all_races
+        if (not season or race["season"] == season)
+        and (venues is None or race["event"] in venues)
+    }
+
+    # A venue index spans every season raced there, so a season filter only
+    # narrows which venues are refreshed.
+    by_venue = {}
+    for race in all_races:
+        if race["event"] in selected_venues:
+            by_venue.setdefault(race["event"], []).append(race)
+
+    results = {}
+    for venue, races in sorted(by_venue.items()):
+        results[venue] = refresh_venue_index(data_dir, venue, races)
+    return results
+
+
+def query_bbox(conn, south, west, north, east, start_ts=None, end_ts=None):
+    query = """
+        SELECT race, ts, boat, lat, lon FROM points
+        WHERE ci BETWEEN ? AND ? AND cj BETWEEN ? AND ?
+          AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?
+    """
+    params = [
+        math.floor(south / CELL_SIZE_DEG),
+        math.floor(north / CELL_SIZE_DEG),
+        math.floor(west / CELL_SIZE_DEG),
+        math.floor(east / CELL_SIZE_DEG),
+        south,
+        north,
+        west,
+        east,
+    ]
+    if start_ts is not None:
+        query += " AND ts >= ?"
+        params.append(start_ts)
+    if end_ts is not None:
+        query += " AND ts <= ?"
+        params.append(end_ts)
+    query += " ORDER BY race, ts"
+    return [list(row) for row in conn.execute(query, params)]
+
+
+def query_radius(conn, lat, lon, radius_m, start_ts=None, end_ts=None):
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    candidates = query_bbox(
+        conn, lat - dlat, lon - dlon, lat + dlat, lon + dlon, start_ts, end_ts
+    )
+    return [
+        point
+        for point in candidates
+        if haversine_m(lat, lon, point[3], point[4]) <= radius_m
+    ]
+
+
+def summarize_passes(hits):
+    passes = {}
+    for rid, ts, boat_id, lat, lon in hits:
+        entry = passes.setdefault((rid, boat_id), {"first_ts": ts, "last_ts": ts})
+        entry["first_ts"] = min(entry["first_ts"], ts)
+        entry["last_ts"] = max(entry["last_ts"], ts)
+    return passes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build and query spatial indexes of boat positions"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--data-dir", default="data")
+    build_parser.add_argument("--season")
+
+    radius_parser = subparsers.add_parser("radius")
+    radius_parser.add_argument("venue")
+    radius_parser.add_argument("lat", type=float)
+    radius_parser.add_argument("lon", type=float)
+    radius_parser.add_argument("metres", type=float)
+
+    bbox_parser = subparsers.add_parser("bbox")
+    bbox_parser.add_argument("venue")
+    for name in ("south", "west", "north", "east"):
+        bbox_parser.add_argument(name, type=float)
+
+    for sub in (radius_parser, bbox_parser):
+        sub.add_argument("--data-dir", default="data")
+        sub.add_argument("--start-ts", type=int)
+        sub.add_argument("--end-ts", type=int)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for venue, changed in build_indexes(args.data_dir, args.season).items():
+            print(f"{venue}: {changed} races re-indexed")
+        return
+
+    started = time.perf_counter()
+    conn = connect_venue_index(args.data_dir, args.venue)
+    if not conn:
+        print(f"No index for venue '{args.venue}', run 'build' first")
+        return
+
+    if args.command == "radius":
+        hits = query_radius(
+            conn, args.lat, args.lon, args.metres, args.start_ts, args.end_ts
+        )
+    else:
+        hits = query_bbox(
+            conn,
+            args.south,
+            args.west,
+            args.north,
+            args.east,
+            args.start_ts,
+            args.end_ts,
+        )
+    conn.close()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    passes = summarize_passes(hits)
+    print(f"{len(hits)} positions, {len(passes)} boat passes ({elapsed_ms:.1f} ms)")
+    for (rid, boat_id), entry in sorted(passes.items()):
+        print(f"  {rid} boat {boat_id}: {entry['first_ts']} -> {entry['last_ts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from archive_reader import get_reader
+from packets import (
+    get_boat_id,
+    get_boat_records,
+    get_lead_status,
+    get_race_status,
+    list_packet_entries,
+    read_artefact,
+    source_signature,
+    write_artefact,
+)
+
+RACE_ENTITY = "race"
+NO_DATA_STATUS = "No data"
+
+
+def boat_entity(boat_id):
+    return f"boat:{boat_id}"
+
+
+def packet_states(packet):
+    states = {RACE_ENTITY: get_race_status(packet)}
+    for index, boat in enumerate(get_boat_records(packet)):
+        states[boat_entity(get_boat_id(boat, index))] = boat.get(
+            "boatStatus", "Unknown"
+        )
+    return states
+
+
+def extract_transitions(race_path):
+    entries = list_packet_entries(race_path)
+    current = {}
+    transitions = []
+    first_ts = first_status = None
+    last_ts = last_status = None
+
+    for ts, packet in get_reader().iter_packets(race_path, include_empty=True):
+        # Empty packets carry no states, but still count as the first or last
+        # packet, the way the feedback report reads them from the files.
+        status = NO_DATA_STATUS if packet is None else get_lead_status(packet)
+        if first_ts is None:
+            first_ts, first_status = ts, status
+        last_ts, last_status = ts, status
+        if packet is None:
+            continue
+
+        for entity, value in packet_states(packet).items():
+            old = current.get(entity)
+            if old != value:
+                transitions.append([ts, entity, old, value])
+                current[entity] = value
+
+    return {
+        "source": source_signature(race_path, entries),
+        "first_ts": first_ts,
+        "first_status": first_status,
+        "last_ts": last_ts,
+        "last_status": last_status,
+        "final_states": current,
+        "transitions": transitions,
+    }
+
+
+def build_transitions(race_path, force=False):
+    log = read_artefact(race_path, "transitions")
+    if not force and log and log.get("source") == source_signature(race_path):
+        return log, False
+    log = extract_transitions(race_path)
+    write_artefact(race_path, "transitions", log, indent=None)
+    return log, True
+
+
+def load_transitions(race_path, signature=None):
+    if signature is None:
+        signature = source_signature(race_path)
+    log = read_artefact(race_path, "transitions")
+    if log and log.get("source") == signature:
+        return log
+    return None
+
+
+def first_transition(log, entity, value):
+    for ts, trans_entity, old, new in log["transitions"]:
+        if trans_entity == entity and new == value:
+            return ts
+    return None
+
+
+def status_at(log, entity, ts):
+    status = None
+    for trans_ts, trans_entity, old, new in log["transitions"]:
+        if trans_ts > ts:
+            break
+        if trans_entity == entity:
+            status = new
+    return status
+
+
+def iter_states(log):
+    state = {}
+    for ts, entity, old, new in log["transitions"]:
+        state[entity] = new
+        yield ts, dict(state)
+
+
+def main():
+    from main import get_all_downloaded_races
+
+    parser = argparse.ArgumentParser(
+        description="Extract race/boat status transition logs from packets"
+    )
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--season")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    races = [
+        r
+        for r in get_all_downloaded_races(args.data_dir)
+        if not args.season or r["season"] == args.season
+    ]
+
+    rebuilt = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(build_transitions, race["full_path"], args.force)
+            for race in races
+        ]
+        for race, future in zip(races, futures):
+            try:
+                log, changed = future.result()
+            except Exception as e:
+                print(
+                    f"  {race['season']}/{race['event']}/{race['race_folder']}: "
+                    f"Error: {e}"
+                )
+                continue
+            rebuilt += changed
+            print(
+                f"  {race['season']}/{race['event']}/{race['race_folder']}: "
+                f"{len(log['transitions'])} transitions over "
+                f"{log['source']['packet_count']} packets"
+            )
+
+    print(f"\nTransition logs: {len(races)} races, {rebuilt} rebuilt")
+
+
+if __name__ == "__main__":
+    main()
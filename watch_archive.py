@@ -0,0 +1,311 @@
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from catalog import connect_catalog, get_race, update_race, walk_race_folders
+from packets import artefact_path
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+DEDUP_SUFFIX = ".dedup.json"
+
+DEFAULT_QUIET_SECONDS = 5.0
+DEFAULT_MAX_WAIT_SECONDS = 60.0
+DEFAULT_POLL_SECONDS = 10.0
+
+
+def race_path_for(data_dir, dir_path, name):
+    depth = len(os.path.relpath(dir_path, data_dir).split(os.sep))
+    if depth == 4:
+        return dir_path
+    # Dedup manifests sit next to the race folder; other sibling artefacts are
+    # written by the updaters themselves and must not retrigger them.
+    if depth == 3 and name.endswith(DEDUP_SUFFIX):
+        return os.path.join(dir_path, name[: -len(DEDUP_SUFFIX)])
+    if depth == 3 and name and os.path.isdir(os.path.join(dir_path, name)):
+        return os.path.join(dir_path, name)
+    return None
+
+
+class InotifySource:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}
+        self.add_tree(data_dir)
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.paths[wd] = path
+
+    def add_tree(self, root):
+        depth = len(os.path.relpath(root, self.data_dir).split(os.sep))
+        if root == self.data_dir:
+            depth = 0
+        self.add_watch(root)
+        if depth < 4:
+            for name in sorted(os.listdir(root)):
+                path = os.path.join(root, name)
+                if os.path.isdir(path):
+                    self.add_tree(path)
+
+    def poll(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            buffer = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+
+        races = set()
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset : offset + length].rstrip(b"\0").decode()
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # The kernel dropped events, so any race may have changed.
+                print("inotify queue overflowed, rescanning all races")
+                races.update(walk_race_folders(self.data_dir))
+                continue
+            dir_path = self.paths.get(wd)
+            if dir_path is None:
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_tree(os.path.join(dir_path, name))
+            elif mask & IN_CREATE:
+                # Files are picked up once they are complete.
+                continue
+            race_path = race_path_for(self.data_dir, dir_path, name)
+            if race_path:
+                races.add(race_path)
+        return races
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    def __init__(self, data_dir, interval=DEFAULT_POLL_SECONDS):
+        self.data_dir = data_dir
+        self.interval = interval
+        self.signatures = self.scan()
+        self.next_scan = time.monotonic() + interval
+
+    def signature(self, race_path):
+        manifest = artefact_path(race_path, "dedup")
+        return (
+            os.stat(race_path).st_mtime_ns,
+            os.stat(manifest).st_mtime_ns if os.path.exists(manifest) else None,
+        )
+
+    def scan(self):
+        return {path: self.signature(path) for path in walk_race_folders(self.data_dir)}
+
+    def poll(self, timeout):
+        # The main loop wakes up often to flush debounced races; the archive
+        # is only walked once per interval.
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(wait, 0))
+        self.next_scan = time.monotonic() + self.interval
+        current = self.scan()
+        changed = {
+            path
+            for path, signature in current.items()
+            if self.signatures.get(path) != signature
+        }
+        self.signatures = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class Debouncer:
+    def __init__(self, quiet_seconds, max_wait_seconds):
+        self.quiet_seconds = quiet_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.pending = {}
+
+    def touch(self, race_path, now):
+        first_seen, _ = self.pending.get(race_path, (now, now))
+        self.pending[race_path] = (first_seen, now)
+
+    def ready(self, now):
+        # A race is rebuilt once it has been quiet for a while, or at least
+        # every max_wait_seconds while a live download keeps it busy.
+        ready = [
+            race_path
+            for race_path, (first_seen, last_seen) in self.pending.items()
+            if now - last_seen >= self.quiet_seconds
+            or now - first_seen >= self.max_wait_seconds
+        ]
+        for race_path in ready:
+            del self.pending[race_path]
+        return ready
+
+    def next_deadline(self, now):
+        if not self.pending:
+            return None
+        return min(
+            min(last_seen + self.quiet_seconds, first_seen + self.max_wait_seconds)
+            for first_seen, last_seen in self.pending.values()
+        ) - now
+
+
+class ArtefactUpdater:
+    def __init__(self, data_dir, skip=()):
+        from archive_reader import enable_packet_cache
+
+        self.data_dir = data_dir
+        self.skip = set(skip)
+        # Each change runs several passes over the same race, which is what
+        # the packet cache is for.
+        self.reader = enable_packet_cache()
+        self.catalog = connect_catalog(data_dir)
+        self.races_data = None
+        self.stale_venues = set()
+
+    def update(self, race_path):
+        from compute_leaderboards import find_expected_race, process_race
+        from main import load_races_data, normalize_race_name
+        from spatial_index import build_race_index
+        from transitions import build_transitions
+
+        if not os.path.isdir(race_path):
+            return []
+        self.reader.invalidate(race_path)
+        season, event, _, race_folder = os.path.relpath(
+            race_path, self.data_dir
+        ).split(os.sep)
+        updated = []
+
+        if "catalog" not in self.skip:
+            row = get_race(self.catalog, race_path)
+            status = row["status"] if row else "downloaded"
+            update_race(self.catalog, self.data_dir, race_path, status)
+            updated.append("catalog")
+        if "transitions" not in self.skip:
+            build_transitions(race_path)
+            updated.append("transitions")
+        if "spatial" not in self.skip:
+            _, changed = build_race_index(race_path)
+            if changed:
+                self.stale_venues.add(event)
+            updated.append("spatial")
+        if "leaderboard" not in self.skip:
+            if self.races_data is None and os.path.exists("races-data.json"):
+                self.races_data = load_races_data()
+            if self.races_data is not None:
+                race = {
+                    "season": season,
+                    "event": event,
+                    "race_folder": race_folder,
+                    "race_folder_normalized": normalize_race_name(race_folder),
+                    "full_path": race_path,
+                }
+                process_race(
+                    race,
+                    *find_expected_race(self.races_data, season, event, race_folder),
+                )
+                updated.append("leaderboard")
+        return updated
+
+    def refresh_venues(self):
+        from spatial_index import build_indexes
+
+        if not self.stale_venues:
+            return []
+        venues = sorted(build_indexes(self.data_dir, venues=self.stale_venues))
+        self.stale_venues.clear()
+        return venues
+
+    def close(self):
+        self.catalog.close()
+
+
+def open_source(data_dir, force_polling, poll_seconds):
+    if not force_polling:
+        try:
+            return InotifySource(data_dir)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+    return PollingSource(data_dir, poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Watch data/ and refresh derived artefacts for changed races"
+    )
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--poll", action="store_true", help="Force polling")
+    parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS)
+    parser.add_argument("--quiet-seconds", type=float, default=DEFAULT_QUIET_SECONDS)
+    parser.add_argument(
+        "--max-wait-seconds", type=float, default=DEFAULT_MAX_WAIT_SECONDS
+    )
+    parser.add_argument(
+        "--skip",
+        action="append",
+        default=[],
+        choices=("catalog", "transitions", "spatial", "leaderboard"),
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    updater = ArtefactUpdater(args.data_dir, args.skip)
+    source = open_source(args.data_dir, args.poll, args.poll_seconds)
+    debouncer = Debouncer(args.quiet_seconds, args.max_wait_seconds)
+    print(f"👀 Watching {args.data_dir} with {type(source).__name__}")
+
+    rebuilds = 0
+    try:
+        while True:
+            deadline = debouncer.next_deadline(time.monotonic())
+            timeout = 1.0 if deadline is None else max(0.0, min(deadline, 1.0))
+            for race_path in source.poll(timeout):
+                debouncer.touch(race_path, time.monotonic())
+            for race_path in debouncer.ready(time.monotonic()):
+                try:
+                    updated = updater.update(race_path)
+                except Exception as e:
+                    print(f"  {race_path}: Error: {e}")
+                    continue
+                if updated:
+                    rebuilds += 1
+                    print(f"  🔄 {race_path}: {', '.join(updated)}")
+            for venue in updater.refresh_venues():
+                print(f"  🗺️  {venue}: venue index merged")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()
+        updater.close()
+    print(f"\nStopped after {rebuilds} race updates")
+
+
+if __name__ == "__main__":
+    main()